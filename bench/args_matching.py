@@ -0,0 +1,32 @@
+#!/usr/bin/env python
+"""
+Measures the per-call cost of checking a call against a MockAct's
+argument condition, for a few common condition shapes.
+
+Usage: python bench/args_matching.py
+"""
+from __future__ import print_function
+import os, sys, timeit
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mocktest import Call, Any, any_args, any_kwargs, any_int, kwargs_containing
+from mocktest.mocking import MockAct
+
+CASES = [
+	('literal args', lambda act: act(1, 'two', 3.0), Call.like(1, 'two', 3.0)),
+	('literal args and kwargs', lambda act: act(1, x='y'), Call.like(1, x='y')),
+	('matcher args', lambda act: act(any_int, Any), Call.like(1, 2)),
+	('leading args then splat', lambda act: act(1, *any_args), Call.like(1, 2, 3, 4)),
+	('kwargs subset', lambda act: act(x=1, **any_kwargs), Call.like(x=1, y=2, z=3)),
+	('kwargs_containing', lambda act: act(**kwargs_containing(x=1)), Call.like(x=1, y=2)),
+]
+
+def main(number=100000):
+	for desc, setup, call in CASES:
+		act = setup(MockAct('bench'))
+		assert act._matches(call), desc
+		elapsed = min(timeit.repeat(lambda: act._matches(call), number=number, repeat=5))
+		print("%-26s %6.0f ns/call" % (desc, elapsed / number * 1e9))
+
+if __name__ == '__main__':
+	main()
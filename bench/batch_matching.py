@@ -0,0 +1,38 @@
+#!/usr/bin/env python
+"""
+Measures matching many calls at once: history queries, and recounting
+calls when an expectation is added after the calls were received.
+
+Usage: python bench/batch_matching.py [number_of_calls]
+"""
+from __future__ import print_function
+import os, sys, timeit
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mocktest import mock, when, expect, MockTransaction, Any, any_string, string_containing, no_stack, lazy_stack
+
+def timed(desc, func):
+	elapsed = min(timeit.repeat(func, number=1, repeat=5))
+	print("%s: %.1f ms" % (desc, elapsed * 1000))
+
+def main(count=100000):
+	with MockTransaction:
+		MockTransaction.stack_capture = no_stack
+		try:
+			obj = mock('obj')
+			when(obj).meth.then_return(None)
+			for i in range(count):
+				obj.meth(i, 'name-%d' % i)
+			calls = obj.meth.received_calls
+			timed("count_where(Any(int), any_string) over %s distinct calls" % (count,),
+				lambda: calls.count_where(Any(int), any_string))
+			timed("calls_where(Any(int), string_containing('-99')) over %s calls" % (count,),
+				lambda: calls.calls_where(Any(int), string_containing('-99')))
+			act = expect(obj).meth(Any(int), any_string).exactly(count).times()
+			timed("recount expect(...).meth(Any(int), any_string) over %s calls" % (count,),
+				lambda: act._recount(calls))
+		finally:
+			MockTransaction.stack_capture = lazy_stack
+
+if __name__ == '__main__':
+	main(*map(int, sys.argv[1:]))
@@ -0,0 +1,25 @@
+#!/usr/bin/env python
+"""
+Measures the memory retained by recorded Call objects.
+
+Usage: python bench/call_memory.py [number_of_calls]
+"""
+from __future__ import print_function
+import os, sys, gc, tracemalloc
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mocktest import Call
+
+def main(count=1000000):
+	args = (1, 'two')
+	gc.collect()
+	tracemalloc.start()
+	before = tracemalloc.get_traced_memory()[0]
+	# a stubbed call receives a new (usually empty) kwargs dict each time
+	calls = [Call(args, dict(), stack=True) for _ in range(count)]
+	after = tracemalloc.get_traced_memory()[0]
+	tracemalloc.stop()
+	print("%s calls: %.1f MB (%.0f bytes/call)" % (count, (after - before) / 1e6, float(after - before) / count))
+
+if __name__ == '__main__':
+	main(*map(int, sys.argv[1:]))
@@ -0,0 +1,29 @@
+#!/usr/bin/env python
+"""
+Measures collection matchers against large arguments.
+
+Usage: python bench/collection_matchers.py
+"""
+from __future__ import print_function
+import os, sys, timeit
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mocktest import object_containing, any_of
+
+def report(desc, func, number):
+	elapsed = min(timeit.repeat(func, number=number, repeat=3)) / number
+	print("%s: %.1f us" % (desc, elapsed * 1e6))
+
+def main():
+	ids = list(range(100000))
+	expected = object_containing(*range(0, 100000, 100))
+	assert expected.matches(ids)
+	report("object_containing(1k ids) against 100k-element list", lambda: expected.matches(ids), 3)
+	missing = object_containing(*range(-1, 100000, 100))
+	report("object_containing(1k ids, first missing) against 100k-element list", lambda: missing.matches(ids), 3)
+
+	allowed = any_of(list(range(10000)))
+	report("any_of(10k-element list) against a missing value", lambda: allowed.matches(-1), 1000)
+
+if __name__ == '__main__':
+	main()
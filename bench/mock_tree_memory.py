@@ -0,0 +1,31 @@
+#!/usr/bin/env python
+"""
+Measures the memory used by auto-created (and never called) mock() nodes.
+
+Usage: python bench/mock_tree_memory.py [number_of_nodes]
+"""
+from __future__ import print_function
+import os, sys, gc, time, tracemalloc
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mocktest import mock, MockTransaction
+
+def main(count=100000):
+	with MockTransaction:
+		root = mock('config')
+		names = ['child_%d' % i for i in range(count // 10)]
+		gc.collect()
+		tracemalloc.start()
+		before = tracemalloc.get_traced_memory()[0]
+		start = time.time()
+		# ten levels deep for each of (count / 10) top-level children
+		for name in names:
+			getattr(root, name).a.b.c.d.e.f.g.h.i
+		elapsed = time.time() - start
+		after = tracemalloc.get_traced_memory()[0]
+		tracemalloc.stop()
+	print("%s nodes: %.1f MB (%.0f bytes/node), created in %.2fs" % (
+		count, (after - before) / 1e6, float(after - before) / count, elapsed))
+
+if __name__ == '__main__':
+	main(*map(int, sys.argv[1:]))
@@ -0,0 +1,36 @@
+#!/usr/bin/env python
+"""
+Measures the cost of overriding many items of a mapping with modify(),
+and of reverting them when the transaction ends.
+
+Usage: python bench/modify_mapping.py [number_of_keys]
+"""
+from __future__ import print_function
+import os, sys, time
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mocktest import modify, MockTransaction
+
+def main(count=100000):
+	flags = dict(('flag_%d' % i, False) for i in range(count))
+	keys = list(flags)
+	MockTransaction.__enter__()
+	start = time.time()
+	for key in keys:
+		modify(flags)[key] = True
+	setup = time.time() - start
+	teardown_actions = len(MockTransaction.teardown_actions)
+	start = time.time()
+	MockTransaction.__exit__()
+	teardown = time.time() - start
+	assert not any(flags.values())
+	print("%s keys: setup %.3fs, teardown %.3fs, %s teardown actions" % (count, setup, teardown, teardown_actions))
+
+	with MockTransaction:
+		start = time.time()
+		modify(flags).update(dict.fromkeys(keys, True))
+		print("%s keys via update(): setup %.3fs" % (count, time.time() - start))
+	assert not any(flags.values())
+
+if __name__ == '__main__':
+	main(*map(int, sys.argv[1:]))
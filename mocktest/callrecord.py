@@ -2,10 +2,149 @@
 Call Records
 ------------
 """
-import sys, os, inspect
+import sys, os, inspect, linecache, threading
+import collections, functools, itertools
+from .mockerror import MockError
+from .matchers.base import _equal
+try:
+	import reprlib
+except ImportError:
+	import repr as reprlib # py2
 
-__all__ = ['Call']
-_recursion_sentinel = object()
+__all__ = [
+	'Call',
+	'StackCapture',
+	'no_stack',
+	'lazy_stack',
+	'full_stack',
+	'sampled_stack',
+	'CallIndex',
+	'CallList',
+	'CallHistory',
+	'keep_all_calls',
+	'keep_calls',
+	'count_calls_only',
+]
+_capture_state = threading.local()
+_MAX_CALL_SITES = 5
+
+# argument reprs in call descriptions are truncated, so that huge
+# arguments don't produce huge failure messages
+class _ShortRepr(reprlib.Repr):
+	def repr_instance(self, x, level):
+		# like reprlib's, but without hiding errors raised by __repr__
+		s = repr(x)
+		if len(s) > self.maxother:
+			i = max(0, (self.maxother - 3) // 2)
+			j = max(0, self.maxother - 3 - i)
+			s = s[:i] + '...' + s[len(s) - j:]
+		return s
+
+_repr = _ShortRepr()
+_repr.maxlevel = 4
+_repr.maxtuple = _repr.maxlist = _repr.maxarray = _repr.maxdict = 20
+_repr.maxset = _repr.maxfrozenset = _repr.maxdeque = 20
+_repr.maxstring = _repr.maxlong = _repr.maxother = 160
+short_repr = _repr.repr
+
+LAZY = 'lazy'
+FULL = 'full'
+
+class StackCapture(object):
+	"""
+	A policy deciding how much call-site information is captured
+	for each call received by a stub. Set it for every stub via
+	``MockTransaction.stack_capture``, or for a single stubbed method
+	via :func:`~mocktest.mocking.MockAct.with_stack`.
+
+	:param mode: ``None`` (capture nothing), ``'lazy'`` (code object and \
+	line number, source is read only when the call is described) or \
+	``'full'`` (source line is read immediately)
+	:param every: only capture the call site of every `every`-th call \
+	(starting with the first)
+	"""
+	def __init__(self, mode, every=1):
+		if mode not in (None, LAZY, FULL):
+			raise ValueError("unknown stack capture mode: %r" % (mode,))
+		if every < 1:
+			raise ValueError("every must be a positive number, got %r" % (every,))
+		self.mode = mode
+		self.every = every
+
+	def mode_for(self, call_index):
+		"""the capture mode for the (zero-based) `call_index`th call"""
+		if self.every == 1 or call_index % self.every == 0:
+			return self.mode
+		return None
+
+	def __repr__(self):
+		if self.every == 1:
+			return "<#%s: %s>" % (type(self).__name__, self.mode)
+		return "<#%s: %s every %s calls>" % (type(self).__name__, self.mode, self.every)
+
+no_stack = StackCapture(None)
+lazy_stack = StackCapture(LAZY)
+full_stack = StackCapture(FULL)
+
+def sampled_stack(every, mode=LAZY):
+	"""capture the call site of only every `every`-th call"""
+	return StackCapture(mode, every)
+
+_MAX_HASH_DEPTH = 4
+
+def _structural_hash(value, depth=0):
+	"""
+	A hash of an unhashable value which is consistent with equality for the
+	builtin containers (dicts, lists, sets and bytearrays, and their contents).
+	Anything else (and anything nested too deeply) hashes to 0, and if
+	`value` itself can't be hashed by its contents, returns None.
+	"""
+	try:
+		return hash(value)
+	except TypeError:
+		pass
+	if depth >= _MAX_HASH_DEPTH:
+		return 0
+	depth += 1
+	opaque = 0 if depth > 1 else None
+	if isinstance(value, dict):
+		return hash(frozenset([(key, _structural_hash(val, depth)) for key, val in value.items()]))
+	if isinstance(value, (list, tuple)):
+		return hash(tuple([_structural_hash(item, depth) for item in value]))
+	if isinstance(value, (set, frozenset)):
+		return hash(frozenset(value))
+	if isinstance(value, bytearray):
+		return hash(bytes(value))
+	return opaque
+
+class _UnhashableArg(object):
+	"""wraps an unhashable argument in a Call's key, so that it can be
+	compared by equality, and hashed by its contents where possible"""
+	__slots__ = ('value', '_hash')
+	def __init__(self, value):
+		self.value = value
+		self._hash = _structural_hash(value)
+
+	@property
+	def opaque(self):
+		"""whether this can only be distinguished from other values by equality"""
+		return self._hash is None
+
+	def __hash__(self):
+		return self._hash or 0
+
+	def __eq__(self, other):
+		return type(other) is _UnhashableArg and _equal(self.value, other.value)
+
+	def __ne__(self, other):
+		return not self.__eq__(other)
+
+def _hashable(value):
+	try:
+		hash(value)
+	except TypeError:
+		return _UnhashableArg(value)
+	return value
 
 class Call(object):
 	"""
@@ -20,61 +159,118 @@ class Call(object):
 	:type args: tuple
 	:param kwargs: keyword arguments
 	:type kwargs: dict
-	:param stack: If True, a stack trace is captured for reporting \
-	where a given call was made.
+	:param stack: If True (or ``'lazy'``), the call site is captured for \
+	reporting where a given call was made. Only the code object and line \
+	number are recorded - the source line is looked up when the call is \
+	first described. ``'full'`` looks up the source line immediately.
 	:members: args, kwargs
 	"""
-	_call_frameinfo = None
+	__slots__ = ('args', '_kwargs', '_code', '_lineno', '_call_frameinfo')
+
 	def __init__(self, args, kwargs, stack = False):
-		self.tuple = (args, kwargs)
 		self.args = args
-		self.kwargs = kwargs
+		self._kwargs = kwargs or None # don't hold on to an empty dict per call
+		self._code = None
+		self._lineno = None
+		self._call_frameinfo = None
 
 		if stack is True:
-			skip_frames = 2 # there are 2 internal mocktest calls between this
-			                # frame and the actual invocation of the mock
-			recurse = _recursion_sentinel
-			current_frame = inspect.currentframe()
-			frame = current_frame and current_frame.f_back
-			target_frame = None
-			while frame:
-				if frame.f_locals.get('recurse', None) is _recursion_sentinel:
-					# we're already collecting a stack for some other call,
-					# cancel this one to prevent infinite recursion
-					target_frame = None
-					break
-				skip_frames -= 1
-				if skip_frames == 0:
-					target_frame = frame
-				frame = frame.f_back
-
-			if target_frame is not None:
-				self._call_frameinfo = inspect.getframeinfo(target_frame, 1)
+			stack = LAZY
+		if stack and not getattr(_capture_state, 'active', False):
+			# capturing is guarded per-thread: if anything used while capturing
+			# has itself been stubbed, the nested call skips its own capture
+			# rather than recursing forever
+			_capture_state.active = True
+			try:
+				skip_frames = 2 # there are 2 internal mocktest calls between this
+				                # frame and the actual invocation of the mock
+				target_frame = inspect.currentframe()
+				while target_frame is not None and skip_frames > 0:
+					target_frame = target_frame.f_back
+					skip_frames -= 1
+
+				if target_frame is not None:
+					self._code = target_frame.f_code
+					self._lineno = target_frame.f_lineno
+					if stack == FULL:
+						file_, line, _func, context, _idx = inspect.getframeinfo(target_frame, 1)
+						self._call_frameinfo = (file_, line, context[0] if context else '')
+			finally:
+				_capture_state.active = False
+
+	@property
+	def kwargs(self):
+		kwargs = self._kwargs
+		return {} if kwargs is None else kwargs
+
+	@property
+	def tuple(self):
+		"""this call's arguments, as an (args, kwargs) tuple"""
+		return (self.args, self.kwargs)
+
+	@property
+	def _call_site(self):
+		"""(code, lineno) for the call site, or None"""
+		if self._code is None:
+			return None
+		return (self._code, self._lineno)
 
 	@classmethod
 	def like(cls, *a, **kw):
 		"""capture a call with the given arguments"""
 		return cls(a, kw)
 
+	def _frameinfo(self):
+		"""(filename, lineno, source_line) for the call site, or None"""
+		if self._call_frameinfo is None and self._code is not None:
+			code, line = self._code, self._lineno
+			source = linecache.getline(code.co_filename, line)
+			self._call_frameinfo = (code.co_filename, line, source)
+		return self._call_frameinfo
+
 	def _concise_stack_line(self):
-		file_, line, func, (code,), _idx = self._call_frameinfo
+		file_, line, code = self._frameinfo()
 		file_ = os.path.basename(file_)
 		return "%s:%-3s :: %s" % (file_, line, code.strip())
 		
+	@property
+	def key(self):
+		"""
+		A hashable key for this call's arguments, equal for all calls with equal arguments.
+		Unhashable arguments are hashed by their contents where possible (for builtin
+		containers), and otherwise compared by equality alone.
+		"""
+		return self._key()[0]
+
+	def _key(self):
+		"""
+		(key, opaque), where `opaque` is True if the key includes any argument
+		which can only be compared by equality (so all such keys hash alike)
+		"""
+		kwargs = self._kwargs
+		key = (self.args, tuple(sorted(kwargs.items())) if kwargs else ())
+		try:
+			hash(key)
+		except TypeError:
+			args = tuple(map(_hashable, self.args))
+			kwargs = tuple([(k, _hashable(v)) for k, v in sorted(kwargs.items())]) if kwargs else ()
+			values = itertools.chain(args, [v for _k, v in kwargs])
+			opaque = any(type(value) is _UnhashableArg and value.opaque for value in values)
+			return (args, kwargs), opaque
+		return key, False
+
 	def __hash__(self):
-		return hash(self.tuple)
+		return hash(self.key)
 
 	def __eq__(self, other):
-		other_tuple = None
 		if isinstance(other, type(self)):
-			other_tuple = other.tuple
-		else:
-			other_tuple = other
-		return self.tuple == other_tuple
+			# compared by key, so that arguments like numpy arrays are compared by _equal
+			return self.key == other.key
+		return self.tuple == other
 	
 	@property
 	def empty(self):
-		return self.tuple == ((), {})
+		return self.args == () and self._kwargs is None
 	
 	def __ne__(self, other):
 		return not self.__eq__(other)
@@ -88,11 +284,11 @@ class Call(object):
 			arg_desc = "()"
 		else:
 			sep = ', '
-			args = sep.join(map(repr, self.args))
-			kwargs = sep.join(["%s=%r" % (key, val) for key, val in self.kwargs.items()])
+			args = sep.join(map(short_repr, self.args))
+			kwargs = sep.join(["%s=%s" % (key, short_repr(val)) for key, val in self.kwargs.items()])
 			arg_desc = "(%s)" % (sep.join(filter(None, (args, kwargs))),)
 		try:
-			if include_stack and self._call_frameinfo is not None:
+			if include_stack and self._call_site is not None:
 				arg_desc = "%-24ls // %s" % (arg_desc, self._concise_stack_line())
 		finally:
 			return arg_desc
@@ -103,3 +299,293 @@ class Call(object):
 	def __repr__(self):
 		return "<#Call: %r>" % (self.tuple,)
 
+
+
+class CallIndex(object):
+	"""
+	Query methods shared by all call containers. They are backed by an
+	index of distinct call arguments. A :class:`CallList` builds it from
+	its calls when first queried; a bounded :class:`CallHistory` updates it
+	as each call is appended - so (unlike the container itself) they take
+	into account every call received, not just those retained.
+	"""
+	_index = None
+	# calls with arguments that can only be compared by equality (see Call._key),
+	# which would all share a bucket in the index. They are only grouped
+	# into the index when it's queried, rather than as each call is received.
+	_pending = None
+
+	def _init_index(self):
+		self._index = {}
+		self._pending = []
+
+	def _add_to_index(self, call):
+		if self._index is None:
+			return
+		key, opaque = call._key()
+		if opaque:
+			self._pending.append(call)
+		else:
+			self._index_call(key, call)
+
+	def _index_call(self, key, call):
+		entry = self._index.get(key)
+		if entry is None:
+			# [first call, count, call sites]
+			self._index[key] = entry = [call, 0, set()]
+		entry[1] += 1
+		sites = entry[2]
+		if call._code is not None and len(sites) < _MAX_CALL_SITES:
+			sites.add((call._code.co_filename, call._lineno))
+
+	def _require_index(self):
+		if self._index is None:
+			raise MockError("%s does not index calls" % (type(self).__name__,))
+		if self._pending:
+			pending, self._pending = self._pending, []
+			for call in pending:
+				self._index_call(call.key, call)
+		return self._index
+
+	def count_of(self, *args, **kwargs):
+		"""the number of calls received with arguments equal to (args, kwargs)"""
+		entry = self._require_index().get(Call(args, kwargs).key)
+		return 0 if entry is None else entry[1]
+
+	def count_where(self, *args, **kwargs):
+		"""
+		The number of calls received with arguments matching (args, kwargs),
+		which may include matchers - e.g:
+
+			>>> obj.meth.received_calls.count_where(any_string, x=any_int)
+
+		This takes time proportional to the number of distinct calls, not
+		the total number of calls.
+		"""
+		entries = list(self._require_index().values())
+		mask = _condition(args, kwargs)._matches_many([call for call, _count, _sites in entries])
+		return sum([entry[1] for entry, matched in zip(entries, mask) if matched])
+
+	def calls_where(self, *args, **kwargs):
+		"""the retained calls with arguments matching (args, kwargs), which may include matchers"""
+		calls = list(self)
+		mask = _condition(args, kwargs)._matches_many(calls)
+		return [call for call, matched in zip(calls, mask) if matched]
+
+	def histogram(self):
+		"""
+		A dict mapping each distinct call received to the number of times
+		it was received. e.g:
+
+			>>> obj.meth.received_calls.histogram()
+			{<#Call: ((1,), {})>: 9998, <#Call: ((2,), {})>: 2}
+		"""
+		return dict([(call, count) for call, count, _sites in self._require_index().values()])
+
+	def groups(self):
+		"""
+		A list of (call, count, call_sites) for each distinct call received,
+		most frequent first. `call_sites` is a set of (filename, lineno) pairs
+		from which the call was made (at most the first few distinct sites
+		are recorded).
+		"""
+		return sorted(self._require_index().values(), key=lambda entry: -entry[1])
+
+	def distinct(self):
+		"""the number of distinct calls received"""
+		return len(self._require_index())
+
+def _condition(args, kwargs):
+	from .mocking import MockAct
+	return MockAct('query')(*args, **kwargs)
+
+class CallList(CallIndex, list):
+	"""
+	The default container for the calls received by a stub: a list
+	retaining every call.
+
+	Since every call is retained, the index is only built from the
+	list when first queried, and afterwards only indexes calls added
+	to the end of the list. Any other modification discards it.
+	"""
+	# the number of calls (from the start of the list) in the index
+	_indexed = 0
+
+	def __init__(self, calls=()):
+		list.__init__(self, calls)
+
+	def _require_index(self):
+		if self._index is None:
+			self._init_index()
+			self._indexed = 0
+		if self._indexed < len(self):
+			for call in self[self._indexed:]:
+				self._add_to_index(call)
+			self._indexed = len(self)
+		return CallIndex._require_index(self)
+
+	@property
+	def total(self):
+		"""the number of calls received"""
+		return len(self)
+
+	def numbered(self):
+		"""iterate over (call_number, call) pairs, where call_number starts at 1"""
+		return enumerate(self, 1)
+
+def _discarding_index(name):
+	method = getattr(list, name)
+	def discarding_index(self, *a):
+		self._index = None
+		return method(self, *a)
+	discarding_index.__name__ = name
+	return discarding_index
+
+# list methods which may modify any part of the list (appending, extending
+# and reordering it leaves the index valid)
+for _name in ('insert', 'pop', 'remove', 'clear', '__setitem__', '__delitem__',
+		'__imul__', '__setslice__', '__delslice__'):
+	if hasattr(list, _name):
+		setattr(CallList, _name, _discarding_index(_name))
+del _name
+
+class CallHistory(CallIndex):
+	"""
+	A bounded container for the calls received by a stub: only the
+	`first` and `last` calls are retained, along with the total number
+	of calls received. Iterating, indexing and comparison only consider
+	the retained calls.
+
+	If `index` is False (the default), the query methods from :class:`CallIndex`
+	are not available. An index keeps one call for each distinct set of
+	arguments, so its memory use is not bounded by `first` and `last`.
+	"""
+	def __init__(self, first=0, last=0, index=False):
+		self._first_limit = first
+		self._first = []
+		self._last = collections.deque(maxlen=last)
+		self.total = 0
+		if index:
+			self._init_index()
+
+	def append(self, call):
+		self.total += 1
+		self._add_to_index(call)
+		if len(self._first) < self._first_limit:
+			self._first.append(call)
+		else:
+			self._last.append(call)
+
+	@property
+	def omitted(self):
+		"""the number of calls received but not retained"""
+		return self.total - len(self)
+
+	def numbered(self):
+		"""iterate over (call_number, call) pairs for the retained calls,
+		where call_number starts at 1"""
+		last_start = self.total - len(self._last) + 1
+		return itertools.chain(
+			enumerate(self._first, 1),
+			enumerate(self._last, last_start))
+
+	def __iter__(self):
+		return itertools.chain(self._first, self._last)
+
+	def __len__(self):
+		return len(self._first) + len(self._last)
+
+	def __getitem__(self, index):
+		return list(self)[index]
+
+	def __eq__(self, other):
+		return list(self) == list(other)
+
+	def __ne__(self, other):
+		return not self.__eq__(other)
+
+	__hash__ = None
+
+	def __repr__(self):
+		return "<#%s: %s calls, retained %r>" % (type(self).__name__, self.total, list(self))
+
+keep_all_calls = CallList
+
+def keep_calls(first=0, last=0, index=False):
+	"""
+	A call history policy retaining only the `first` and `last` calls received.
+	Pass ``index=True`` to also support the query methods from :class:`CallIndex`
+	(and summaries of distinct arguments in failure reports), at the cost of
+	keeping one call for each distinct set of arguments received.
+	"""
+	return functools.partial(CallHistory, first, last, index)
+
+count_calls_only = functools.partial(CallHistory, 0, 0, False)
+
+def describe_calls(call_list, limit=10):
+	"""
+	Describe the given calls, one per line. When there are more than
+	2 * `limit` calls, only the first and last `limit` calls are listed,
+	followed by a summary grouping every call received by its arguments
+	(most frequent first), with the number of times each was received and
+	where it was called from. A `limit` of None lists every call.
+	"""
+	total = getattr(call_list, 'total', None)
+	if total is None:
+		total = len(call_list)
+	if total == 0:
+		return "0 calls"
+	lines = ["%s calls with arguments:" % (total,)]
+	numbered = call_list.numbered() if hasattr(call_list, 'numbered') else enumerate(call_list, 1)
+	first = list(itertools.islice(numbered, limit))
+	last = list(collections.deque(numbered, maxlen=limit))
+	previous = 0
+	for i, call in first + last:
+		if i > previous + 1:
+			lines.append("  ... (%s calls not shown)" % (i - previous - 1,))
+		lines.append("  %s:   %s" % (i, call))
+		previous = i
+	if total > previous:
+		lines.append("  ... (%s calls not shown)" % (total - previous,))
+	if len(first) + len(last) < total:
+		lines.extend(_describe_groups(call_list, limit))
+	return "\n".join(lines)
+
+def dump_calls(call_list, path):
+	"""write a description of every retained call in `call_list` to the file at `path`"""
+	with open(path, 'w') as f:
+		for i, call in (call_list.numbered() if hasattr(call_list, 'numbered') else enumerate(call_list, 1)):
+			f.write("%s:   %s\n" % (i, call))
+
+def _call_groups(call_list):
+	"""(call, count, call_sites) for each distinct call, most frequent first"""
+	if isinstance(call_list, CallIndex):
+		if call_list._index is None:
+			return []
+		return call_list.groups()
+	groups = collections.OrderedDict()
+	for call in call_list:
+		group = groups.get(call)
+		if group is None:
+			groups[call] = group = [call, 0, set()]
+		group[1] += 1
+		if call._code is not None and len(group[2]) < _MAX_CALL_SITES:
+			group[2].add((call._code.co_filename, call._lineno))
+	return sorted(groups.values(), key=lambda group: -group[1])
+
+def _describe_sites(sites):
+	return ", ".join(["%s:%s" % (os.path.basename(file_), line) for file_, line in sorted(sites)])
+
+def _describe_groups(call_list, limit):
+	groups = _call_groups(call_list)
+	if not groups:
+		return []
+	lines = ["  distinct arguments (%s):" % (len(groups),)]
+	for call, count, sites in groups[:limit]:
+		line = "    %s x %s" % (count, call.desc())
+		if sites:
+			line = "%-32s // %s" % (line, _describe_sites(sites))
+		lines.append(line)
+	if limit is not None and len(groups) > limit:
+		lines.append("    ... (%s more)" % (len(groups) - limit,))
+	return lines
@@ -2,10 +2,19 @@ __all__ = [
 	'ensure_singleton_class',
 ]
 
+import threading
+
+# singleton class -> the class it was created from
 ORIGINAL_CLASSES = {}
 CLASS = object()
 BASES = object()
 
+# original class -> singleton classes no longer in use, available for reuse.
+# Creating a class is expensive (and invalidates method caches), so each
+# singleton class is returned here once its instance is reverted.
+_POOL = {}
+_pool_lock = threading.Lock()
+
 from ..mockerror import MockError
 from ..transaction import MockTransaction
 
@@ -14,22 +23,60 @@ def _root(instance):
 		return type
 	return object
 
-class Singleton(object): pass
+class Singleton(object):
+	__slots__ = ()
+
+# the attributes of a singleton class that has not been modified
+_CLEAN_ATTRS = frozenset(type('Singleton', (object,), {'__slots__': ()}).__dict__)
+
+def _acquire_singleton_class(original_class):
+	with _pool_lock:
+		available = _POOL.get(original_class)
+		if available:
+			return available.pop()
+	# no __slots__ means a new __dict__, which would prevent
+	# __class__ assignment on instances of slotted classes
+	new_class = type(original_class.__name__, (original_class, Singleton), {'__slots__': ()})
+	with _pool_lock:
+		ORIGINAL_CLASSES[new_class] = original_class
+	return new_class
+
+def _release_singleton_class(singleton_class):
+	with _pool_lock:
+		original_class = ORIGINAL_CLASSES.get(singleton_class)
+		if original_class is None:
+			return
+		# reverting a stub on the singleton class may have left the original
+		# attribute assigned directly on it, which is removed before reuse
+		try:
+			for name in set(singleton_class.__dict__) - _CLEAN_ATTRS:
+				delattr(singleton_class, name)
+		except (AttributeError, TypeError):
+			del ORIGINAL_CLASSES[singleton_class]
+			return
+		_POOL.setdefault(original_class, []).append(singleton_class)
 
 def ensure_singleton_class(self):
 	if isinstance(self, Singleton):
 		return
 	root = _root(self)
 	original_class = type(self)
-	new_class = type(original_class.__name__, (original_class, Singleton), {})
+	new_class = _acquire_singleton_class(original_class)
 	try:
 		root.__setattr__(self, '__class__', new_class) # bypass any __setattr__ interception
 	except TypeError:
+		_release_singleton_class(new_class)
 		raise MockError("Can't alter class of '%s'" % (type(self).__name__))
 	MockTransaction.add_teardown(lambda: revert_singleton_class(self, original_class))
 
-def revert_singleton_class(self, original_class):
+def revert_singleton_class(self, original_class=None):
+	singleton_class = type(self)
+	if original_class is None:
+		original_class = ORIGINAL_CLASSES.get(singleton_class)
+		if original_class is None:
+			return
 	_root(self).__setattr__(self, '__class__', original_class)
+	_release_singleton_class(singleton_class)
 
 #handy mixin class
 class SingletonClass(object):
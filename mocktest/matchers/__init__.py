@@ -13,8 +13,12 @@ Argument Matchers
 
 .. automodule:: mocktest.matchers.collections
 	:members:
+
+.. automodule:: mocktest.matchers.numeric
+	:members:
 """
 from .base import *
 from .type_matcher import *
 from .string import *
 from .collections import *
+from .numeric import *
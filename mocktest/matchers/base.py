@@ -27,20 +27,77 @@ Basic Matchers
 .. data:: _not
 
 	Alias for :data:`Not`
+
+Matchers can also be combined using the ``&`` (and), ``|`` (or) and ``~`` (not) operators:
+	>>> Any(int) & Not(any_of([0]))
+	>>> string_containing('error') | string_containing('warning')
+	>>> ~any_string
+
+Combined matchers check their cheapest conditions first, and stop as soon
+as the result is known. Nested combinations of the same operator are
+flattened, so ``a & (b & c)`` is equivalent to ``a & b & c``.
 """
 
 __all__ = ['Matcher', 'Any', 'any_', 'Not', 'not_', 'SplatMatcher', 'KwargsMatcher', 'matcher']
 
+try:
+	import numpy
+except ImportError:
+	numpy = None
+
+def _is_array(objects):
+	"""whether `objects` is a one-dimensional numpy array"""
+	return numpy is not None and isinstance(objects, numpy.ndarray) and objects.ndim == 1
+
+def _equal(a, b):
+	"""
+	Whether a == b, including for objects (like numpy arrays) whose ==
+	returns an elementwise result that can't be used as a boolean.
+	"""
+	try:
+		return bool(a == b)
+	except ValueError:
+		if numpy is None:
+			raise
+		return bool(numpy.array_equal(a, b))
+
+def _first_false(mask):
+	"""the index of the first False value in `mask`, or None"""
+	if _is_array(mask):
+		indexes = numpy.flatnonzero(~mask)
+		return int(indexes[0]) if len(indexes) else None
+	for i, matched in enumerate(mask):
+		if not matched:
+			return i
+	return None
+
 class Matcher(object):
 	"""
 	Base matcher class
 	"""
 	_desc = 'unnamed matcher'
 
+	# A rough estimate of how expensive `matches` is, relative to
+	# other matchers. Combined matchers check cheaper conditions first.
+	_cost = 10
+
 	def desc(self):
 		"""return a description of this matcher"""
 		return self._desc
 
+	def __and__(self, other):
+		if not isinstance(other, Matcher):
+			return NotImplemented
+		return AllOfMatcher(self, other)
+
+	def __or__(self, other):
+		if not isinstance(other, Matcher):
+			return NotImplemented
+		return AnyOfMatcher(self, other)
+
+	def __invert__(self):
+		return NegatedMatcher(self)
+
 	def __str__(self):
 		return "Matcher for \"%s\"" % (self.desc(),)
 
@@ -55,17 +112,136 @@ class Matcher(object):
 		"""return True if this matcher is satisfied by the given object, else False"""
 		raise AssertionError("matcher has not overidden `matches`!")
 
+	def matches_many(self, objects):
+		"""
+		Return a list of booleans, one for each of `objects`, saying whether this
+		matcher is satisfied by that object. Some matchers check many objects at
+		once much faster than one at a time, and some (given a one-dimensional
+		numpy array) return a numpy array of booleans instead of a list.
+		"""
+		matches = self.matches
+		return [bool(matches(obj)) for obj in objects]
+
+	def first_mismatch(self, objects):
+		"""return the index of the first of `objects` not satisfying this matcher, or None if they all do"""
+		if type(self).matches_many is not Matcher.matches_many:
+			return _first_false(self.matches_many(objects))
+		matches = self.matches
+		for i, obj in enumerate(objects):
+			if not matches(obj):
+				return i
+		return None
+
+	def describe_mismatch(self, obj):
+		"""
+		Return a short description of why `obj` doesn't satisfy this matcher,
+		or None if there's nothing to add beyond `desc()`. Used in failure
+		messages in place of a full repr of large objects (like arrays).
+		"""
+		return None
+
 class NegatedMatcher(Matcher):
 	def __init__(self, orig):
 		if not isinstance(orig, Matcher):
 			raise TypeError("expected a Matcher, got %s" % (type(orig).__name__,))
 		self.orig = orig
 		
+	@property
+	def _cost(self):
+		return self.orig._cost
+
 	def matches(self, other):
 		return not self.orig.matches(other)
 
+	def matches_many(self, objects):
+		mask = self.orig.matches_many(objects)
+		if _is_array(mask):
+			return ~mask
+		return [not matched for matched in mask]
+
+	def __invert__(self):
+		return self.orig
+
 	def desc(self):
-		return 'not %s' % (self.orig.desc(),)
+		desc = self.orig.desc()
+		if isinstance(self.orig, _CompositeMatcher):
+			desc = "(%s)" % (desc,)
+		return 'not %s' % (desc,)
+
+class _CompositeMatcher(Matcher):
+	"""
+	A combination of matchers. `matchers` holds them in the order given (with nested
+	combinations of the same type flattened), while they are checked in order of cost.
+	"""
+	_operator = None
+	def __init__(self, *matchers):
+		flattened = []
+		for matcher in matchers:
+			if not isinstance(matcher, Matcher):
+				raise TypeError("expected a Matcher, got %s" % (type(matcher).__name__,))
+			if type(matcher) is type(self):
+				flattened.extend(matcher.matchers)
+			else:
+				flattened.append(matcher)
+		self.matchers = tuple(flattened)
+		self._ordered = tuple(sorted(flattened, key=lambda matcher: matcher._cost))
+		self._cost = sum(matcher._cost for matcher in flattened)
+
+	def matches_many(self, objects):
+		if _is_array(objects):
+			mask = numpy.full(len(objects), self._identity, dtype=bool)
+			for matcher in self._ordered:
+				self._combine_array(mask, numpy.asarray(matcher.matches_many(objects), dtype=bool))
+			return mask
+		# each matcher only checks the objects whose result is still undecided
+		objects = list(objects)
+		undecided = list(range(len(objects)))
+		for matcher in self._ordered:
+			if not undecided:
+				break
+			results = matcher.matches_many([objects[i] for i in undecided])
+			undecided = [i for i, matched in zip(undecided, results) if bool(matched) is self._identity]
+		mask = [not self._identity] * len(objects)
+		for i in undecided:
+			mask[i] = self._identity
+		return mask
+
+	def desc(self):
+		descriptions = []
+		for matcher in self.matchers:
+			desc = matcher.desc()
+			if isinstance(matcher, _CompositeMatcher):
+				desc = "(%s)" % (desc,)
+			descriptions.append(desc)
+		return (" %s " % (self._operator,)).join(descriptions)
+
+class AllOfMatcher(_CompositeMatcher):
+	"""matches an object that all of the given matchers match"""
+	_operator = 'and'
+	_identity = True # the result when no matcher has decided otherwise
+	@staticmethod
+	def _combine_array(mask, results):
+		mask &= results
+
+	def matches(self, other):
+		for matcher in self._ordered:
+			if not matcher.matches(other):
+				return False
+		return True
+
+class AnyOfMatcher(_CompositeMatcher):
+	"""matches an object that at least one of the given matchers matches"""
+	_operator = 'or'
+	_identity = False
+	@staticmethod
+	def _combine_array(mask, results):
+		mask |= results
+
+	def matches(self, other):
+		for matcher in self._ordered:
+			if matcher.matches(other):
+				return True
+		return False
 
 def matcher(matches, desc = 'anonymous matcher'):
 	"""
@@ -145,9 +321,14 @@ class AnyObject(KwargsMatcher):
 		from .type_matcher import TypeMatcher
 		return TypeMatcher(cls)
 
+	_cost = 0
+
 	def matches(self, other):
 		return True
 
+	def matches_many(self, objects):
+		return [True for obj in objects]
+
 	def desc(self):
 		return "any object"
 
@@ -4,9 +4,12 @@ from __future__ import absolute_import
 Collection Matchers
 -------------------
 
-.. function:: any_of(*elements)
+.. function:: any_of(collection)
 
-	Matches an argument if it is any of the listed elements
+	Matches an argument if it is any of the elements in `collection`.
+	A tuple is looked up by hash if all its elements are hashable.
+	Other collections (e.g. a list) are searched each time, so any
+	changes made to them after creating the matcher are taken into account.
 
 .. function:: object_containing(*elements)
 
@@ -38,7 +41,7 @@ Collection Matchers
 
 
 """
-from .base import Matcher, KwargsMatcher, SplatMatcherMaker, Any
+from .base import Matcher, KwargsMatcher, SplatMatcherMaker, Any, _is_array, numpy
 __all__ = [
 	'object_containing',
 	'dict_containing',
@@ -49,17 +52,47 @@ __all__ = [
 	'any_of',
 	]
 
+def _frozenset_or_none(items):
+	"""a frozenset of `items`, or None if they are not all hashable"""
+	try:
+		return frozenset(items)
+	except TypeError:
+		return None
+
+_REAL_TYPES = (bool, int, float)
+
+# sequences whose `in` operator is a plain linear equality scan
+_SEQUENCE_TYPES = (list, tuple)
+
 class IncludeMatcher(Matcher):
+	_cost = 5
 	def __init__(self, *items):
 		self.items = items
+		self._item_set = _frozenset_or_none(items)
 	
 	def matches(self, other):
-		return all([item in other for item in self.items])
+		if self._item_set is not None and type(other) in _SEQUENCE_TYPES and len(self.items) > 1:
+			# a single scan over `other`, rather than one per item
+			remaining = set(self._item_set)
+			try:
+				for element in other:
+					remaining.discard(element)
+					if not remaining:
+						return True
+			except TypeError:
+				pass # unhashable element, fall back to `in`
+			else:
+				return False
+		for item in self.items:
+			if item not in other:
+				return False
+		return True
 	
 	def desc(self):
 		return "object containing %r" % (self.items,)
 
 class DictIncludeMatcher(Matcher):
+	_cost = 5
 	def __init__(self, **kw):
 		self._kw = kw
 	
@@ -80,12 +113,48 @@ class DictIncludeMatcher(Matcher):
 	def desc(self):
 		return "dict includes %r" % (self._kw,)
 
+def _numeric_items(items):
+	"""`items` as a list, if they are all real numbers (which numpy can compare), else None"""
+	if all(type(item) in _REAL_TYPES for item in items):
+		return list(items)
+	return None
+
 class ItemMatcher(Matcher):
+	_cost = 2
 	def __init__(self, collection):
 		self.collection = collection
+		self._item_set = None
+		# only immutable collections can be hashed ahead of time
+		if type(collection) is tuple:
+			self._item_set = _frozenset_or_none(collection)
+		elif type(collection) is frozenset:
+			self._item_set = collection
 	
 	def matches(self, other):
+		item_set = self._item_set
+		if item_set is not None:
+			try:
+				return other in item_set
+			except TypeError:
+				pass # unhashable `other`
 		return other in self.collection
+
+	def matches_many(self, objects):
+		item_set = self._item_set
+		if item_set is None and type(self.collection) in _SEQUENCE_TYPES:
+			# hashing the collection once per batch, rather than for every match
+			item_set = _frozenset_or_none(self.collection)
+		if item_set is None:
+			return super(ItemMatcher, self).matches_many(objects)
+		if _is_array(objects) and objects.dtype.kind in 'biuf':
+			numeric_items = _numeric_items(item_set)
+			if numeric_items is not None:
+				return numpy.isin(objects, numeric_items)
+		try:
+			return [obj in item_set for obj in objects]
+		except TypeError:
+			# an unhashable object
+			return super(ItemMatcher, self).matches_many(objects)
 	
 	def desc(self):
 		return "an item from the collection: %r" % (self.collection,)
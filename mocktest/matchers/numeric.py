@@ -0,0 +1,297 @@
+from __future__ import absolute_import
+"""
+Numeric Matchers
+----------------
+
+Each of these matches either a single number, or a sequence (list, tuple
+or numpy array) of numbers. Numpy arrays are compared in a single vectorised
+operation, and a failed :func:`~mocktest.mocktest.TestCase.assertMatches`
+summarises where the arrays differ (the number of differing elements, the
+first differing index and the largest deviation) rather than printing
+both arrays in full.
+
+.. function:: approx(value, rel=1e-6, abs=1e-12)
+
+	Matches a number within a tolerance of `value`: the greater of `rel`
+	(relative to `value`) and `abs`. If `value` is a sequence, matches a
+	sequence of the same length (or an array of the same shape) where each
+	element is within tolerance of the corresponding element of `value`.
+
+.. function:: in_range(lo, hi)
+
+	Matches a number between `lo` and `hi` (inclusive), or a sequence of
+	numbers which are all between `lo` and `hi`. Either bound may be
+	None, for a range which is open at that end.
+
+.. function:: array_equal(expected)
+
+	Matches a sequence of the same length (or an array of the same shape)
+	as `expected`, with each element equal to the corresponding element
+	of `expected`.
+"""
+
+__all__ = [
+	'approx',
+	'in_range',
+	'array_equal',
+]
+import numbers
+from .base import Matcher, _equal, numpy
+
+_abs = abs
+
+def _is_ndarray(obj):
+	return numpy is not None and isinstance(obj, numpy.ndarray)
+
+def _is_sequence(obj):
+	return isinstance(obj, (list, tuple)) or _is_ndarray(obj)
+
+def _is_number(obj):
+	return isinstance(obj, numbers.Number)
+
+def _index(flat_index, shape):
+	if len(shape) == 1:
+		return flat_index
+	return tuple(int(i) for i in numpy.unravel_index(flat_index, shape))
+
+def _shape(obj):
+	return obj.shape if _is_ndarray(obj) else (len(obj),)
+
+def _short_repr(value):
+	from ..callrecord import short_repr
+	return short_repr(value)
+
+def _summarise(failures, total, first, deviation=None):
+	"""
+	`failures` of `total` elements don't match; `first` describes the
+	first mismatch, and `deviation` is the largest (if applicable)
+	"""
+	summary = "%s of %s elements don't match, first at %s" % (failures, total, first)
+	if deviation is not None:
+		summary += ", max deviation %r" % (deviation,)
+	return summary
+
+class ApproxMatcher(Matcher):
+	_cost = 3
+	def __init__(self, value, rel=1e-6, abs=1e-12):
+		self.value = value
+		self.rel = rel
+		self.abs = abs
+
+	def _tolerance(self, expected):
+		return max(self.rel * _abs(expected), self.abs)
+
+	def _close(self, actual, expected):
+		if not (_is_number(actual) and _is_number(expected)):
+			return False
+		return actual == expected or _abs(actual - expected) <= self._tolerance(expected)
+
+	def _close_array(self, actual, expected):
+		"""a boolean mask of which elements of `actual` are close to `expected`"""
+		actual = numpy.asarray(actual)
+		expected = numpy.asarray(expected)
+		tolerance = numpy.maximum(self.rel * numpy.abs(expected), self.abs)
+		with numpy.errstate(invalid='ignore'):
+			return (actual == expected) | (numpy.abs(actual - expected) <= tolerance)
+
+	def _deviations(self, other):
+		"""
+		(mask, deviations, total) for each element of the sequence `other` compared
+		to this matcher's (sequence) value, or None if their shapes differ
+		"""
+		value = self.value
+		if _is_ndarray(other) or _is_ndarray(value):
+			other, value = numpy.asarray(other), numpy.asarray(value)
+			if other.shape != value.shape:
+				return None
+			with numpy.errstate(invalid='ignore'):
+				return self._close_array(other, value), numpy.abs(other - value), other.size
+		if len(other) != len(value):
+			return None
+		mask = [self._close(actual, expected) for actual, expected in zip(other, value)]
+		return mask, None, len(mask)
+
+	def matches(self, other):
+		try:
+			if not _is_sequence(self.value):
+				return not _is_sequence(other) and self._close(other, self.value)
+			if not _is_sequence(other):
+				return False
+			deviations = self._deviations(other)
+			if deviations is None:
+				return False
+			mask = deviations[0]
+			return bool(numpy.all(mask)) if _is_ndarray(mask) else all(mask)
+		except (TypeError, ValueError):
+			return False
+
+	def matches_many(self, objects):
+		value = self.value
+		if _is_ndarray(objects) and objects.ndim == 1 and objects.dtype.kind in 'biuf' and not _is_sequence(value) and _is_number(value):
+			return self._close_array(objects, value)
+		return [self.matches(obj) for obj in objects]
+
+	def describe_mismatch(self, other):
+		if not _is_number(other) and not _is_sequence(other):
+			return None
+		try:
+			if not _is_sequence(self.value):
+				if _is_sequence(other):
+					return None
+				return "differs by %r (tolerance %r)" % (_abs(other - self.value), self._tolerance(self.value))
+			if not _is_sequence(other):
+				return None
+			deviations = self._deviations(other)
+			if deviations is None:
+				return "shape %s differs from expected %s" % (_shape(other), _shape(self.value))
+			mask, deviation, total = deviations
+			if _is_ndarray(mask):
+				failed = numpy.flatnonzero(numpy.logical_not(mask))
+				if not len(failed):
+					return None
+				first = int(failed[0])
+				values = numpy.asarray(other).ravel()
+				expected = numpy.asarray(self.value).ravel()
+				return _summarise(len(failed), total,
+					"index %r (%r != %r)" % (_index(first, mask.shape), values[first].item(), expected[first].item()),
+					float(numpy.max(deviation)))
+			failed = [i for i, close in enumerate(mask) if not close]
+			if not failed:
+				return None
+			first = failed[0]
+			deviations = [_abs(other[i] - self.value[i]) for i in failed
+				if _is_number(other[i]) and _is_number(self.value[i])]
+			return _summarise(len(failed), total,
+				"index %r (%r != %r)" % (first, other[first], self.value[first]),
+				max(deviations) if deviations else None)
+		except (TypeError, ValueError):
+			return None
+
+	def desc(self):
+		return "approximately %s (rel=%r, abs=%r)" % (_short_repr(self.value), self.rel, self.abs)
+
+class RangeMatcher(Matcher):
+	_cost = 2
+	def __init__(self, lo, hi):
+		self.lo = lo
+		self.hi = hi
+
+	def _in_range(self, value):
+		return _is_number(value) and (self.lo is None or value >= self.lo) and (self.hi is None or value <= self.hi)
+
+	def _in_range_array(self, array):
+		"""a boolean mask of which elements of `array` are in range"""
+		mask = numpy.ones(array.shape, dtype=bool)
+		if self.lo is not None:
+			mask &= array >= self.lo
+		if self.hi is not None:
+			mask &= array <= self.hi
+		return mask
+
+	def _deviation(self, value):
+		"""how far `value` is outside this range"""
+		if self.lo is not None and value < self.lo:
+			return self.lo - value
+		return value - self.hi
+
+	def matches(self, other):
+		try:
+			if _is_ndarray(other):
+				return bool(numpy.all(self._in_range_array(other)))
+			if _is_sequence(other):
+				return all(self._in_range(value) for value in other)
+			return self._in_range(other)
+		except (TypeError, ValueError):
+			return False
+
+	def matches_many(self, objects):
+		if _is_ndarray(objects) and objects.ndim == 1 and objects.dtype.kind in 'biuf':
+			return self._in_range_array(objects)
+		return [self.matches(obj) for obj in objects]
+
+	def describe_mismatch(self, other):
+		try:
+			if _is_ndarray(other):
+				values = other.ravel()
+				failed = numpy.flatnonzero(numpy.logical_not(self._in_range_array(values)))
+				if not len(failed):
+					return None
+				first = int(failed[0])
+				outside = values[failed]
+				deviation = numpy.zeros(outside.shape)
+				if self.lo is not None:
+					deviation = numpy.maximum(deviation, self.lo - outside)
+				if self.hi is not None:
+					deviation = numpy.maximum(deviation, outside - self.hi)
+				return _summarise(len(failed), len(values),
+					"index %r (%r)" % (_index(first, other.shape), values[first].item()),
+					float(numpy.max(deviation)))
+			if _is_sequence(other):
+				values = other
+				failed = [i for i, value in enumerate(values) if not self._in_range(value)]
+				if not failed:
+					return None
+				first = failed[0]
+			elif _is_number(other) and not self._in_range(other):
+				return "outside the range by %r" % (self._deviation(other),)
+			else:
+				return None
+			deviations = [self._deviation(values[i]) for i in failed if _is_number(values[i])]
+			return _summarise(len(failed), len(values),
+				"index %r (%r)" % (first, values[first]),
+				max(deviations) if deviations else None)
+		except (TypeError, ValueError):
+			return None
+
+	def desc(self):
+		if self.lo is None:
+			return "a number at most %r" % (self.hi,)
+		if self.hi is None:
+			return "a number at least %r" % (self.lo,)
+		return "a number between %r and %r" % (self.lo, self.hi)
+
+class ArrayEqualMatcher(Matcher):
+	_cost = 3
+	def __init__(self, expected):
+		self.expected = expected
+
+	def matches(self, other):
+		expected = self.expected
+		if not _is_sequence(other):
+			return False
+		if numpy is not None and (_is_ndarray(other) or _is_ndarray(expected)):
+			return bool(numpy.array_equal(other, expected))
+		return len(other) == len(expected) and all(_equal(actual, value) for actual, value in zip(other, expected))
+
+	def describe_mismatch(self, other):
+		expected = self.expected
+		if not _is_sequence(other):
+			return None
+		if numpy is not None and (_is_ndarray(other) or _is_ndarray(expected)):
+			actual, expected = numpy.asarray(other), numpy.asarray(expected)
+			if actual.shape != expected.shape:
+				return "shape %s differs from expected %s" % (actual.shape, expected.shape)
+			failed = numpy.flatnonzero(actual != expected)
+			if not len(failed):
+				return None
+			first = int(failed[0])
+			deviation = None
+			if actual.dtype.kind in 'biuf' and expected.dtype.kind in 'biuf':
+				deviation = float(numpy.max(numpy.abs(actual.astype(float) - expected)))
+			return _summarise(len(failed), actual.size,
+				"index %r (%r != %r)" % (_index(first, actual.shape), actual.ravel()[first].item(), expected.ravel()[first].item()),
+				deviation)
+		if len(other) != len(expected):
+			return "length %s differs from expected %s" % (len(other), len(expected))
+		failed = [i for i, (actual, value) in enumerate(zip(other, expected)) if not _equal(actual, value)]
+		if not failed:
+			return None
+		first = failed[0]
+		return _summarise(len(failed), len(expected), "index %r (%r != %r)" % (first, other[first], expected[first]))
+
+	def desc(self):
+		return "a sequence equal to %s" % (_short_repr(self.expected),)
+
+approx = ApproxMatcher
+in_range = RangeMatcher
+array_equal = ArrayEqualMatcher
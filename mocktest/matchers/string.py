@@ -7,23 +7,71 @@ String Matchers
 
 	Takes either a string or a compiled regex pattern.
 
+.. function:: string_matching_any(*patterns)
+
+	Matches a string matching any of the given patterns (strings or
+	compiled regexes). Where possible, the patterns are combined into a
+	single regex, so that they are all checked in one pass.
+	The matcher's ``matching_pattern(string)`` method returns the
+	pattern that matched (or None).
+
 .. function:: string_containing(substring)
 
 	Matches any string containing the given substring
+
+.. function:: string_containing_any(*substrings)
+
+	Matches any string containing at least one of the given substrings.
+	The matcher's ``matching_substring(string)`` method returns the
+	substring that was found (or None).
+
+Compiled patterns are shared between matchers, in a cache of the
+most recently used patterns (see :data:`regex_cache_size`).
+
+.. data:: regex_cache_size
+
+	The maximum number of compiled patterns to keep (default: 256).
 """
 
 __all__ = [
 	'string_matching',
+	'string_matching_any',
 	'string_containing',
+	'string_containing_any',
 ]
 import re
-from .base import Matcher
+import threading
+import collections
+from .base import Matcher, _is_array, numpy
+
+regex_cache_size = 256
+_regex_cache = collections.OrderedDict()
+_regex_cache_lock = threading.Lock()
+
+def _compile(pattern, flags=0):
+	"""compile `pattern`, using a shared cache of recently-compiled patterns"""
+	key = (type(pattern), pattern, flags)
+	with _regex_cache_lock:
+		regex = _regex_cache.pop(key, None)
+		if regex is not None:
+			_regex_cache[key] = regex
+			return regex
+	regex = re.compile(pattern, flags)
+	with _regex_cache_lock:
+		_regex_cache[key] = regex
+		while len(_regex_cache) > regex_cache_size:
+			_regex_cache.popitem(last=False)
+	return regex
+
+def _compile_each(patterns):
+	return [_compile(pattern) if isinstance(pattern, str) else pattern for pattern in patterns]
 
 class StringRegexMatcher(Matcher):
+	_cost = 5
 	def __init__(self, regex):
 		self.desc_str = regex
 		if isinstance(regex, str):
-			regex = re.compile(regex)
+			regex = _compile(regex)
 		self.regex = regex
 	
 	def matches(self, other):
@@ -32,16 +80,93 @@ class StringRegexMatcher(Matcher):
 	def desc(self):
 		return "a string matching: %s" % (self.desc_str,)
 
+class MultiRegexMatcher(Matcher):
+	_cost = 5
+	def __init__(self, *patterns):
+		self.patterns = patterns
+		self.regexes = _compile_each(patterns)
+		self._combined = self._combine(self.regexes)
+
+	@staticmethod
+	def _combine(regexes):
+		"""
+		A single regex matching any of `regexes`, with each alternative in a group
+		named `_<index>`. Returns None if they can't be safely combined (group
+		numbers would change, their flags differ, or they aren't all str patterns).
+		"""
+		if not regexes or any(regex.groups or not isinstance(regex.pattern, str) for regex in regexes):
+			return None
+		flags = set(regex.flags for regex in regexes)
+		if len(flags) > 1:
+			return None
+		source = "|".join("(?P<_%d>%s)" % (i, regex.pattern) for i, regex in enumerate(regexes))
+		try:
+			return _compile(source, flags.pop())
+		except (re.error, TypeError):
+			return None
+
+	def matching_pattern(self, other):
+		"""the first of this matcher's patterns that matches `other`, or None"""
+		if self._combined is not None:
+			match = self._combined.match(other)
+			if match is None:
+				return None
+			return self.patterns[int(match.lastgroup[1:])]
+		for pattern, regex in zip(self.patterns, self.regexes):
+			if regex.match(other):
+				return pattern
+		return None
+
+	def matches(self, other):
+		if self._combined is not None:
+			return bool(self._combined.match(other))
+		for regex in self.regexes:
+			if regex.match(other):
+				return True
+		return False
+
+	def desc(self):
+		return "a string matching any of: %s" % (", ".join(map(str, self.patterns)),)
+
 class SubstringMatcher(Matcher):
+	_cost = 2
 	def __init__(self, regex):
 		self.expected = regex
 	
 	def matches(self, other):
 		return isinstance(other, str) and self.expected in other
+
+	def matches_many(self, objects):
+		expected = self.expected
+		if _is_array(objects) and objects.dtype.kind == 'U':
+			return numpy.char.find(objects, expected) >= 0
+		return [isinstance(obj, str) and expected in obj for obj in objects]
 	
 	def desc(self):
 		return "a string containing: %s" % (self.expected,)
 
+class MultiSubstringMatcher(Matcher):
+	_cost = 3
+	def __init__(self, *substrings):
+		self.substrings = substrings
+		# longest first, so that each substring found at a given position is reported in preference to its prefixes
+		needles = sorted(set(substrings), key=len, reverse=True)
+		self._regex = _compile("|".join(map(re.escape, needles))) if substrings else None
+
+	def matching_substring(self, other):
+		"""one of this matcher's substrings contained in `other` (the one occurring first), or None"""
+		if not isinstance(other, str) or self._regex is None:
+			return None
+		match = self._regex.search(other)
+		return None if match is None else match.group(0)
+
+	def matches(self, other):
+		return isinstance(other, str) and self._regex is not None and self._regex.search(other) is not None
+
+	def desc(self):
+		return "a string containing any of: %s" % (", ".join(self.substrings),)
+
 string_matching = StringRegexMatcher
+string_matching_any = MultiRegexMatcher
 string_containing = SubstringMatcher
-
+string_containing_any = MultiSubstringMatcher
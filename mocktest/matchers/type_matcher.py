@@ -22,19 +22,28 @@ __all__ = [
 	'object_with'
 ]
 
-from .base import Matcher
+from .base import Matcher, _is_array, numpy
 
 class TypeMatcher(Matcher):
+	_cost = 1
 	def __init__(self, cls):
 		self.cls = cls
 	
 	def matches(self, other):
 		return isinstance(other, self.cls)
+
+	def matches_many(self, objects):
+		cls = self.cls
+		if _is_array(objects) and objects.dtype != object:
+			# every element has the same type
+			return numpy.full(len(objects), issubclass(objects.dtype.type, cls), dtype=bool)
+		return [isinstance(obj, cls) for obj in objects]
 	
 	def desc(self):
 		return "any instance of %s" % (self.cls.__name__,)
 
 class ObjectWithAttribute(Matcher):
+	_cost = 2
 	def __init__(self, attr_name):
 		self.attr_name = attr_name
 	
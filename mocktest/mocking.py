@@ -1,11 +1,16 @@
 from __future__ import absolute_import
-from .matchers import Matcher, SplatMatcher
+from .matchers import Matcher, SplatMatcher, Any
+from .matchers.base import _equal
 from .mockerror import MockError
-from .callrecord import Call
+from .callrecord import Call, describe_calls, dump_calls
 from .transaction import MockTransaction
 import itertools
 import collections
 import operator
+import os
+import re
+import sys
+import tempfile
 
 from .lib.singletonclass import ensure_singleton_class
 __unittest = True
@@ -14,12 +19,57 @@ __all__ = [
 	'when',
 	'expect',
 	'mock',
+	'mock_stats',
 	'modify',
 	'Object',
 ]
 
 class ReturnValuesExhausted(Exception): pass
 
+class LazyTypeError(TypeError):
+	"""
+	A TypeError whose message is only built when it's first needed, since
+	code under test may catch (and ignore) the exception. Once built, the
+	message is a regular string - in ``args``, ``str()``, ``repr()`` and
+	when pickled. e.g:
+
+		>>> raise LazyTypeError(lambda: expensive_description())
+
+	(AssertionErrors are always rendered as test failures, and unittest
+	relies on their exact type - so they are raised with a plain message.)
+	"""
+	def __init__(self, describe):
+		super(LazyTypeError, self).__init__()
+		self._describe = describe
+
+	def _render(self):
+		describe = self._describe
+		if describe is not None:
+			self._describe = None
+			BaseException.args.__set__(self, (describe(),))
+
+	@property
+	def args(self):
+		self._render()
+		return BaseException.args.__get__(self)
+
+	@args.setter
+	def args(self, args):
+		self._describe = None
+		BaseException.args.__set__(self, args)
+
+	def __str__(self):
+		self._render()
+		return super(LazyTypeError, self).__str__()
+
+	def __repr__(self):
+		self._render()
+		return super(LazyTypeError, self).__repr__()
+
+	def __reduce__(self):
+		# unpickled as a plain TypeError, since `describe` may not be picklable
+		return (TypeError, self.args)
+
 Settable = collections.namedtuple('Settable', ('get','set','delete', 'error'))
 Item = Settable(
 	get=operator.getitem,
@@ -28,8 +78,14 @@ Item = Settable(
 	error=KeyError,
 )
 
+def _get_attr(obj, name):
+	"""getattr(obj, name), except that it never creates a new child of a mock"""
+	if isinstance(obj, RecursiveStub):
+		return obj._mock_existing_attr(name)
+	return getattr(obj, name)
+
 Attr = Settable(
-	get=getattr,
+	get=_get_attr,
 	set=setattr,
 	delete=delattr,
 	error=AttributeError,
@@ -56,7 +112,7 @@ def expect(obj):
 	"""
 	return GetWrapper(lambda name: mock_expect(obj, name))
 
-def mock(name='unnamed mock', create_children=True):
+def mock(name='unnamed mock', create_children=True, max_depth=None, max_nodes=None):
 	"""
 	Make a mock object.
 
@@ -64,9 +120,137 @@ def mock(name='unnamed mock', create_children=True):
 	:param create_children: when attributes are accessed on this
 		mock, they will be created by default. Set this to False to
 		raise an AttributeError instead
+	:param max_depth: the maximum depth of automatically created
+		children (the mock itself is at depth 0). Defaults to
+		``MockTransaction.mock_max_depth``
+	:param max_nodes: the maximum number of nodes (including the mock
+		itself) in this mock's tree of automatically created children.
+		Defaults to ``MockTransaction.mock_max_nodes``
 	:rtype: :class:`~mocktest.mocking.RecursiveStub`
+
+	Creating a child beyond either limit raises a
+	:class:`~mocktest.mockerror.MockError`. See :func:`mock_stats` to find
+	out where a large mock's nodes and calls are.
+	"""
+	if max_depth is None:
+		max_depth = MockTransaction.mock_max_depth
+	if max_nodes is None:
+		max_nodes = MockTransaction.mock_max_nodes
+	return RecursiveStub(name, create_children, _MockTree(max_depth, max_nodes))
+
+class MockStats(object):
+	"""
+	Statistics for a mock and its children, as returned by :func:`mock_stats`.
+
+	.. data:: name
+	.. data:: nodes
+
+		The number of mock objects in this subtree (including this one).
+
+	.. data:: calls
+
+		The number of calls received by mocks (and stubbed methods) in this subtree.
+
+	.. data:: bytes
+
+		The approximate memory retained by the mocks in this subtree,
+		and the calls they have recorded.
+
+	.. data:: children
+
+		A list of MockStats for each child mock, largest first.
+	"""
+	def __init__(self, name):
+		self.name = name
+		self.nodes = 1
+		self.calls = 0
+		self.bytes = 0
+		self.children = []
+
+	def __repr__(self):
+		return "<#%s: %s>" % (type(self).__name__, self._summary())
+
+	def _summary(self):
+		return "%s: %s nodes, %s calls, ~%s bytes" % (self.name, self.nodes, self.calls, self.bytes)
+
+	def desc(self, limit=5, depth=3):
+		"""
+		A description of this subtree, listing the largest `limit`
+		children at each level, down to `depth` levels.
+		"""
+		lines = []
+		def describe(stats, indent, depth):
+			lines.append(indent + stats._summary())
+			if depth <= 0:
+				return
+			for child in stats.children[:limit]:
+				describe(child, indent + '  ', depth - 1)
+			hidden = stats.children[limit:]
+			if hidden:
+				lines.append("%s  ... (%s more children, %s nodes)" % (
+					indent, len(hidden), sum(child.nodes for child in hidden)))
+		describe(self, '', depth)
+		return "\n".join(lines)
+
+	__str__ = desc
+
+def _call_stats(calls):
+	"""returns (total calls, approximate retained bytes) of a call list"""
+	if calls is None:
+		return 0, 0
+	size = sys.getsizeof(calls)
+	for call in calls:
+		size += sys.getsizeof(call) + sys.getsizeof(call.args)
+		if call._kwargs is not None:
+			size += sys.getsizeof(call._kwargs)
+	return calls.total, size
+
+def mock_stats(obj):
 	"""
-	return RecursiveStub(name, create_children)
+	Collect statistics about the size of a mock object (as returned by
+	:func:`mock`) and each of its children, e.g. to find which mocks are
+	using the most memory:
+
+		>>> print(mock_stats(obj).desc())
+		config: 1201 nodes, 5000 calls, ~1031744 bytes
+		  database: 1000 nodes, 4000 calls, ~817000 bytes
+		  ...
+
+	:rtype: :class:`~mocktest.mocking.MockStats`
+	"""
+	root = MockStats(obj._mock_name)
+	seen = set([id(obj)])
+	stack = [(obj, root)]
+	ordered = []
+	while stack:
+		node, stats = stack.pop()
+		ordered.append(stats)
+		stats.calls, stats.bytes = _call_stats(node._mock_calls)
+		stats.bytes += sys.getsizeof(node)
+		if node._mock_children is not None:
+			stats.bytes += sys.getsizeof(node._mock_children)
+		for name, child in node._mock_child_items():
+			if isinstance(child, RecursiveStub):
+				if id(child) in seen:
+					continue
+				seen.add(id(child))
+				child_stats = MockStats(name)
+				stats.children.append(child_stats)
+				stack.append((child, child_stats))
+			elif isinstance(child, StubbedMethod):
+				calls, size = _call_stats(child.received_calls)
+				stats.calls += calls
+				stats.bytes += size
+
+	# every node's stats come after its parent's, so in reverse
+	# order each subtree is complete before it's added to its parent
+	for stats in reversed(ordered):
+		stats.children.sort(key=lambda child: child.bytes, reverse=True)
+		for child in stats.children:
+			stats.nodes += child.nodes
+			stats.calls += child.calls
+			stats.bytes += child.bytes
+	return root
 
 def modify(obj):
 	"""
@@ -77,6 +261,9 @@ def modify(obj):
 		>>> modify(obj)['item'] = replacement_item
 	
 	All replaced attributes / items will be reverted when the test completes.
+	Replaced items are recorded in a single journal per object, so replacing
+	many items (e.g. with :func:`~RecursiveAssignmentWrapper.update`) is cheap to set up
+	and revert.
 
 	:rtype: :class:`~mocktest.mocking.RecursiveAssignmentWrapper`
 	"""
@@ -85,6 +272,7 @@ def modify(obj):
 def add_teardown_for(obj, attr, settable = Attr):
 	"""add a hook to remove `attr` when transaction ends.
 	Settable can be Attr or Item"""
+	MockTransaction.claim(obj, 'item' if settable is Item else 'attr', attr)
 	try:
 		old_attr = settable.get(obj, attr)
 	except settable.error:
@@ -112,6 +300,18 @@ def delegating_settable_with_rollback(obj, settable):
 	_delete = lambda _, *a: settable.delete(obj, *a)
 	return settable._replace(get=_get, set=_set, delete=_delete)
 
+def journaled_settable(obj, settable):
+	"""a settable that, when `set` is called, records the original value
+	of each key in the current transaction's journal for `obj`, to be
+	reverted (in a single pass over all changed keys) when it ends.
+	"""
+	kind = 'item' if settable is Item else 'attr'
+	def _set(_ignored_obj, name, val):
+		MockTransaction.journal(obj, kind, settable).set(name, val)
+	_get = lambda _, *a: settable.get(obj, *a)
+	_delete = lambda _, *a: settable.delete(obj, *a)
+	return settable._replace(get=_get, set=_set, delete=_delete)
+
 def fallback_settable(fallback_obj, settable):
 	"""a settable that will set items locally, and fallback to the original object when
 	`get` is called for an unset key"""
@@ -129,6 +329,184 @@ def fallback_settable(fallback_obj, settable):
 
 	return settable._replace(get=_get, set=_set, delete=_delete)
 
+_LITERAL_TYPES = set([int, float, complex, str, bytes, bool, type(None)])
+try:
+	_LITERAL_TYPES.update([long, unicode])
+except NameError:
+	pass # py3
+
+def _is_literal(value):
+	cls = type(value)
+	if cls in _LITERAL_TYPES:
+		return True
+	if cls is tuple or cls is frozenset:
+		return all(map(_is_literal, value))
+	return False
+
+def _literal_key(args, kwargs):
+	"""a hashable key for the given call arguments, or None if any
+	of them are not plain literals (whose hash is consistent with ==)"""
+	if not all(map(_is_literal, args)):
+		return None
+	if not kwargs:
+		return (args, ())
+	if not all(map(_is_literal, kwargs.values())):
+		return None
+	return (args, tuple(sorted(kwargs.items())))
+
+# Argument conditions are compiled once (when an act's arguments are set)
+# into checkers specialised for the shape of the expected arguments:
+# the position of any splat matcher, which slots are plain values and
+# which are matchers, and the set of expected keyword names.
+# Plain values are compared by identity and then ==, falling back to
+# _equal for values (like numpy arrays) whose == compares elementwise.
+# Literal slots are checked first, then matchers in positional order,
+# stopping at the first that doesn't match.
+
+def _compile_fixed(expected):
+	"""returns check(a) for a tuple of expected positional args (without splats)"""
+	expected = tuple(expected)
+	length = len(expected)
+	if length == 0:
+		return lambda a: not a
+	matcher_slots = [(i, x.matches) for i, x in enumerate(expected) if isinstance(x, Matcher)]
+	literal_slots = [(i, x) for i, x in enumerate(expected) if not isinstance(x, Matcher)]
+	if not matcher_slots:
+		def check_literals(a):
+			try:
+				return a == expected
+			except ValueError:
+				return len(a) == length and all(a[i] is val or _equal(a[i], val) for i, val in literal_slots)
+		return check_literals
+	def check(a):
+		if len(a) != length:
+			return False
+		try:
+			for i, val in literal_slots:
+				if a[i] is not val and not a[i] == val:
+					return False
+		except ValueError:
+			for i, val in literal_slots:
+				if a[i] is not val and not _equal(a[i], val):
+					return False
+		for i, matches in matcher_slots:
+			if not matches(a[i]):
+				return False
+		return True
+	return check
+
+_call_args = operator.attrgetter('args')
+_call_kwargs = operator.attrgetter('_kwargs')
+
+def _compile_fixed_many(expected):
+	"""
+	returns check_many(arg_tuples), the batch equivalent of _compile_fixed(expected):
+	it returns the indexes of each tuple of positional args in `arg_tuples` that matches.
+	Each matcher checks a whole column of arguments at once (using
+	:func:`~mocktest.matchers.base.Matcher.matches_many`), skipping rows that
+	have already failed to match - so each argument is checked in the same
+	order, and against the same rows, as _compile_fixed would.
+	"""
+	expected = tuple(expected)
+	length = len(expected)
+	literal_slots = [(i, x) for i, x in enumerate(expected) if not isinstance(x, Matcher)]
+	matcher_slots = [(i, x) for i, x in enumerate(expected) if isinstance(x, Matcher)]
+	checks = [(i, lambda column, val=val: [value is val or _equal(value, val) for value in column])
+		for i, val in literal_slots]
+	checks.extend([(i, matcher.matches_many) for i, matcher in matcher_slots])
+	def check_many(arg_tuples):
+		indexes = range(len(arg_tuples))
+		if any(len(a) != length for a in arg_tuples):
+			right_length = [len(a) == length for a in arg_tuples]
+			indexes = list(itertools.compress(indexes, right_length))
+			arg_tuples = list(itertools.compress(arg_tuples, right_length))
+		if not arg_tuples:
+			return []
+		columns = list(zip(*arg_tuples))
+		for i, check in checks:
+			results = check(columns[i])
+			if all(results):
+				continue
+			indexes = list(itertools.compress(indexes, results))
+			if not indexes:
+				return []
+			columns = [list(itertools.compress(column, results)) for column in columns]
+		return list(indexes)
+	return check_many
+
+def _compile_positional(expected):
+	"""returns check(a) for a tuple of expected positional args"""
+	splat_positions = [i for i, x in enumerate(expected) if isinstance(x, SplatMatcher)]
+	if not splat_positions:
+		return _compile_fixed(expected)
+	if len(splat_positions) > 1:
+		raise MockError("only one splat matcher may be used in an argument list")
+
+	splat_pos, = splat_positions
+	splat = expected[splat_pos]
+	leading_count = splat_pos
+	trailing_count = len(expected) - splat_pos - 1
+	min_length = leading_count + trailing_count
+	check_leading = _compile_fixed(expected[:splat_pos])
+	check_trailing = _compile_fixed(expected[splat_pos+1:])
+	def check(a):
+		length = len(a)
+		if length < min_length:
+			return False
+		splat_end = length - trailing_count
+		return (
+			check_leading(a[:leading_count]) and
+			check_trailing(a[splat_end:]) and
+			splat.matches(a[leading_count:splat_end], {}))
+	return check
+
+def _compile_keywords(expected):
+	"""returns check(k) for a dict of expected keyword args"""
+	expected = dict(expected)
+	wildcard_matcher = expected.pop('__kwargs', None)
+	keys = frozenset(expected)
+	matcher_slots = [(key, val.matches) for key, val in expected.items() if isinstance(val, Matcher)]
+	literal_slots = [(key, val) for key, val in expected.items() if not isinstance(val, Matcher)]
+
+	if wildcard_matcher is None:
+		length = len(keys)
+		if not matcher_slots:
+			def check_literals(k):
+				try:
+					return k == expected
+				except ValueError:
+					return len(k) == length and keys.issuperset(k) and all(_equal(k[key], val) for key, val in literal_slots)
+			return check_literals
+		def check(k):
+			if len(k) != length or not keys.issuperset(k):
+				return False
+			for key, val in literal_slots:
+				if not _equal(k[key], val):
+					return False
+			for key, matches in matcher_slots:
+				if not matches(k[key]):
+					return False
+			return True
+		return check
+
+	if wildcard_matcher is Any:
+		wildcard_matches = None
+	else:
+		wildcard_matches = wildcard_matcher.matches
+	def check_with_wildcard(k):
+		for key, val in literal_slots:
+			if key not in k or not _equal(k[key], val):
+				return False
+		for key, matches in matcher_slots:
+			if key not in k or not matches(k[key]):
+				return False
+		if wildcard_matches is None:
+			return True
+		if keys:
+			k = dict((key, val) for key, val in k.items() if key not in keys)
+		return wildcard_matches(k)
+	return check_with_wildcard
+
 def mock_when(obj, name):
 	return stub_method(obj, name)._new_act(name).at_least(0).times()
 
@@ -177,16 +555,14 @@ class RecursiveAssignmentWrapper(RealSetter):
 	>>> modify(sys).stderr.write = my_write_func
 	"""
 	def __init__(self, delegate, modify_delegate=True):
-		self._real_set(_modify_delegate=modify_delegate)
 		if modify_delegate:
-			item = delegating_settable_with_rollback(delegate, Item)
+			item = journaled_settable(delegate, Item)
 			attr = delegating_settable_with_rollback(delegate, Attr)
 		else:
 			item = fallback_settable(delegate, Item)
 			attr = fallback_settable(delegate, Attr)
 
-		self._real_set(_item_setter=item)
-		self._real_set(_attr_setter=attr)
+		self._real_set(_modify_delegate=modify_delegate, _item_setter=item, _attr_setter=attr)
 	
 	def children(self, **children):
 		"""
@@ -208,6 +584,18 @@ class RecursiveAssignmentWrapper(RealSetter):
 		"""
 		return assign_kwargs_methods(self, **methods)
 
+	def update(self, *mapping, **items):
+		"""
+		Set many items at once, accepting the same arguments as ``dict.update``:
+
+			>>> modify(os.environ).update({'HOME': '/tmp', 'USER': 'nobody'})
+			>>> modify(flags).update(new_ui=True, beta=False)
+		"""
+		setter = self._item_setter
+		for key, val in dict(*mapping, **items).items():
+			setter.set(self, key, val)
+		return self
+
 	def copying(self, other, value=lambda *a, **kw: None):
 		"""
 		Copy all non-special attributes of `other`, setting
@@ -285,7 +673,16 @@ class DictObject(dict):
 	def __repr__(self): return "<#%s: %s>" % (type(self).__name__, self.__name)
 	def __str__(self): return self.__name
 
-class RecursiveStub(Object):
+class _MockTree(object):
+	"""the limits (and current size) of the tree of nodes created from a single mock()"""
+	__slots__ = ('max_depth', 'max_nodes', 'nodes')
+
+	def __init__(self, max_depth=None, max_nodes=None):
+		self.max_depth = max_depth
+		self.max_nodes = max_nodes
+		self.nodes = 1
+
+class RecursiveStub(object):
 	"""
 	The return value from :func:`mock`.
 
@@ -293,21 +690,113 @@ class RecursiveStub(Object):
 	are accessed (unless create_unknown_children is False).
 
 	Returns None (and saves the call information) when called
+
+	Mock trees can get very large, so each node is kept as small as
+	possible: children and received calls are only allocated when a
+	node first has a child or is first called.
 	"""
-	def __init__(self, name="unnamed object", create_unknown_children=True):
-		self.received_calls = []
-		super(RecursiveStub, self).__init__(name)
-		self._create_unknown_children = create_unknown_children
+	# most nodes have at most one child, which is stored inline
+	# (in _mock_child_name and _mock_child). Further children go in _mock_children.
+	__slots__ = ('_mock_name', '_mock_create_unknown_children', '_mock_tree', '_mock_depth',
+		'_mock_child_name', '_mock_child', '_mock_children', '_mock_calls', '__weakref__')
+
+	def __init__(self, name="unnamed object", create_unknown_children=True, _tree=None, _depth=0):
+		_set = object.__setattr__
+		_set(self, '_mock_name', name)
+		_set(self, '_mock_create_unknown_children', create_unknown_children)
+		_set(self, '_mock_tree', _MockTree() if _tree is None else _tree)
+		_set(self, '_mock_depth', _depth)
+		_set(self, '_mock_child_name', None)
+		_set(self, '_mock_child', None)
+		_set(self, '_mock_children', None)
+		_set(self, '_mock_calls', None)
+
+	def __repr__(self): return "<#%s: %s>" % (type(self).__name__, self._mock_name)
+	def __str__(self): return self._mock_name
+
+	@property
+	def received_calls(self):
+		calls = self._mock_calls
+		if calls is None:
+			calls = MockTransaction.call_history()
+			object.__setattr__(self, '_mock_calls', calls)
+		return calls
+
+	@received_calls.setter
+	def received_calls(self, calls):
+		object.__setattr__(self, '_mock_calls', calls)
 
 	def __getattr__(self, name):
-		if not self._create_unknown_children:
-			return super(RecursiveStub, self).__getattr__(name)
-		obj = RecursiveStub(name=name)
+		if name == self._mock_child_name:
+			return self._mock_child
+		children = self._mock_children
+		if children is not None and name in children:
+			return children[name]
+		if not self._mock_create_unknown_children:
+			raise AttributeError("%r has no attribute %r" % (self, name))
+		tree = self._mock_tree
+		depth = self._mock_depth + 1
+		if tree.max_depth is not None and depth > tree.max_depth:
+			raise MockError("Can't create child %r of %r: mock exceeds its maximum depth of %s" % (
+				name, self, tree.max_depth))
+		if tree.max_nodes is not None and tree.nodes >= tree.max_nodes:
+			raise MockError("Can't create child %r of %r: mock exceeds its maximum of %s nodes" % (
+				name, self, tree.max_nodes))
+		tree.nodes += 1
+		obj = RecursiveStub(name, True, tree, depth)
 		setattr(self, name, obj)
 		return obj
+
+	def __setattr__(self, name, value):
+		_set = object.__setattr__
+		if name in _RECURSIVE_STUB_ATTRS:
+			_set(self, name, value)
+		elif self._mock_child_name is None or name == self._mock_child_name:
+			_set(self, '_mock_child_name', name)
+			_set(self, '_mock_child', value)
+		else:
+			children = self._mock_children
+			if children is None:
+				children = {}
+				_set(self, '_mock_children', children)
+			children[name] = value
+
+	def __delattr__(self, name):
+		if name == self._mock_child_name:
+			object.__setattr__(self, '_mock_child_name', None)
+			object.__setattr__(self, '_mock_child', None)
+			return
+		children = self._mock_children
+		if children is None or name not in children:
+			raise AttributeError(name)
+		del children[name]
+
+	def _mock_existing_attr(self, name):
+		"""like getattr(self, name), but raises AttributeError instead of creating a new child"""
+		try:
+			return object.__getattribute__(self, name)
+		except AttributeError:
+			pass
+		if name == self._mock_child_name:
+			return self._mock_child
+		children = self._mock_children
+		if children is not None and name in children:
+			return children[name]
+		raise AttributeError("%r has no attribute %r" % (self, name))
+
+	def _mock_child_items(self):
+		if self._mock_child_name is not None:
+			yield self._mock_child_name, self._mock_child
+		if self._mock_children is not None:
+			for item in self._mock_children.items():
+				yield item
+
+	def __dir__(self):
+		return sorted(set(dir(type(self))) | set(name for name, child in self._mock_child_items()))
 	
 	def __call__(self, *a, **kw):
-		self.received_calls.append(Call(a,kw, stack=True))
+		calls = self.received_calls
+		calls.append(Call(a, kw, stack=MockTransaction.stack_capture.mode_for(calls.total)))
 		return None
 
 	def with_children(self, **children):
@@ -334,20 +823,27 @@ class RecursiveStub(Object):
 		"""
 		return assign_kwargs_methods(self, **methods)
 
+_RECURSIVE_STUB_ATTRS = frozenset(RecursiveStub.__slots__ + ('received_calls',))
+
 def stub_method(obj, name):
 	assert MockTransaction.started, "Mock transaction has not been started. Make sure you are inheriting from mocktest.TestCase"
 	if _special_method(name) and not isinstance(obj, type):
 		ensure_singleton_class(obj)
 		obj = type(obj)
-	add_teardown_for(obj, name)
 	try:
-		old_attr = getattr(obj, name)
-		if isinstance(old_attr, StubbedMethod):
-			return old_attr
+		old_attr = _get_attr(obj, name)
 	except AttributeError:
-		pass
+		old_attr = None
+	stub = MockTransaction.stub_for(obj, name)
+	if stub is not None and old_attr is stub:
+		return stub
+	add_teardown_for(obj, name)
+	if isinstance(old_attr, StubbedMethod):
+		MockTransaction.register_stub(obj, name, old_attr)
+		return old_attr
 	new_attr = StubbedMethod(name)
 	setattr(obj, name, new_attr)
+	MockTransaction.register_stub(obj, name, new_attr)
 	return new_attr
 
 
@@ -361,47 +857,255 @@ class StubbedMethod(object):
 	.. data:: received_calls:
 
 		The set of calls this stub has received, as a list of :class:`~mocktest.callrecord.Call` instances.
+		If a bounded call history is in use (see ``MockTransaction.call_history``), this is a
+		:class:`~mocktest.callrecord.CallHistory` instead. Either way, its ``total`` attribute
+		is the number of calls received.
 	"""
+	_stack_capture = None
+	# the calls received before the current nested transaction began
+	_saved_calls = None
+
 	def __init__(self, name):
 		self._acts = []
+		self._dispatch = None
+		self._counting = None
 		self._name = name
-		self.received_calls = []
+		self._transaction = MockTransaction.current
+		self._call_history = MockTransaction.call_history
+		self.received_calls = self._call_history()
 		MockTransaction.add_teardown(self._verify)
+		MockTransaction.add_savepoint(self._save_calls)
+		MockTransaction.add_reset(self._verify_and_reset)
 	
 	def __repr__(self):
 		return "stubbed method %r" %(self._name,)
 	
 	def _new_act(self, name):
 		act = MockAct(name)
+		act._stub = self
 		self._acts.append(act)
+		self._acts_changed()
+		if MockTransaction.current is not self._transaction:
+			# added inside a nested transaction, so only lasts as long as it does
+			MockTransaction.add_teardown(lambda: self._remove_act(act))
 		return act
+
+	def _remove_act(self, act):
+		self._acts.remove(act)
+		self._acts_changed()
+		self._verify_act(act)
+
+	def count_of(self, *args, **kwargs):
+		"""the number of calls received with arguments equal to (args, kwargs).
+		See :class:`~mocktest.callrecord.CallIndex`"""
+		return self.received_calls.count_of(*args, **kwargs)
+
+	def count_where(self, *args, **kwargs):
+		"""the number of calls received with arguments matching (args, kwargs).
+		See :class:`~mocktest.callrecord.CallIndex`"""
+		return self.received_calls.count_where(*args, **kwargs)
+
+	def calls_where(self, *args, **kwargs):
+		"""the received calls with arguments matching (args, kwargs).
+		See :class:`~mocktest.callrecord.CallIndex`"""
+		return self.received_calls.calls_where(*args, **kwargs)
+
+	def histogram(self):
+		"""a dict of each distinct call received, mapped to the number of times it was received.
+		See :class:`~mocktest.callrecord.CallIndex`"""
+		return self.received_calls.histogram()
+
+	def _set_call_history(self, call_history):
+		self._call_history = call_history
+		history = call_history()
+		for call in self.received_calls:
+			history.append(call)
+		self.received_calls = history
+
+	def _acts_changed(self, act=None):
+		"""
+		Called whenever an act is added or reconfigured. Any changed act
+		has its match count brought up to date with the calls received so far.
+		"""
+		self._dispatch = None
+		self._counting = None
+		if act is not None:
+			act._verified_at_reset = False
+			act._recount(self.received_calls)
+
+	def _counting_index(self):
+		"""
+		Returns (exact, generic) for the acts whose calls need to be counted,
+		where `exact` maps literal argument keys to a list of acts and
+		`generic` is a list of all other counted acts.
+		"""
+		if self._counting is None:
+			exact = {}
+			generic = []
+			for act in self._acts:
+				if not act._counted:
+					continue
+				if act._exact_key is None:
+					generic.append(act)
+				else:
+					exact.setdefault(act._exact_key, []).append(act)
+			self._counting = (exact, generic)
+		return self._counting
+
+	def _count(self, call):
+		"""
+		Increment the match count of every counted act matching `call`.
+		Returns a dict of the acts checked against `call` and whether they matched.
+		"""
+		exact, generic = self._counting_index()
+		checked = {}
+		matched_acts = []
+		if exact:
+			key = _literal_key(call.args, call.kwargs)
+			if key is None:
+				for acts in exact.values():
+					for act in acts:
+						checked[act] = matched = bool(act._matches(call))
+						if matched:
+							matched_acts.append(act)
+			else:
+				matched_acts.extend(exact.get(key, ()))
+		for act in generic:
+			checked[act] = matched = bool(act._matches(call))
+			if matched:
+				matched_acts.append(act)
+
+		exceeded = None
+		for act in matched_acts:
+			act._match_count += 1
+			upper = act._bounds[1]
+			if upper is not None and act._match_count > upper and exceeded is None and act._fails_fast():
+				exceeded = act
+		if exceeded is not None:
+			received_calls = self.received_calls
+			raise AssertionError("%s\nThe call exceeding this expectation was: %s" % (
+				exceeded.summary(False, received_calls), call))
+		return checked
+
+	def _dispatch_index(self):
+		"""
+		Returns (exact, generic), where `exact` maps the literal argument key of
+		each exact-argument act to the position of the latest such act, and
+		`generic` lists the positions of all other acts (in order).
+		"""
+		if self._dispatch is None:
+			exact = {}
+			generic = []
+			for pos, act in enumerate(self._acts):
+				if act._exact_key is None:
+					generic.append(pos)
+				else:
+					exact[act._exact_key] = pos
+			self._dispatch = (exact, generic)
+		return self._dispatch
+
+	def _act_for(self, call, checked={}):
+		"""
+		The most recently added act matching `call`, or None.
+		`checked` holds the results of acts that have already been checked against `call`.
+		"""
+		exact, generic = self._dispatch_index()
+		acts = self._acts
+		exact_pos = -1
+		if exact:
+			key = _literal_key(call.args, call.kwargs)
+			if key is None:
+				# non-literal arguments may compare equal to anything,
+				# so every act must be checked in order
+				for act in reversed(acts):
+					matched = checked.get(act)
+					if matched is None:
+						matched = act._matches(call)
+					if matched:
+						return act
+				return None
+			exact_pos = exact.get(key, -1)
+
+		for pos in reversed(generic):
+			if pos < exact_pos:
+				break
+			act = acts[pos]
+			matched = checked.get(act)
+			if matched is None:
+				matched = act._matches(call)
+			if matched:
+				return act
+		if exact_pos >= 0:
+			return acts[exact_pos]
+		return None
 	
 	def __call__(self, *a, **kw):
-		call = Call(a, kw, stack=True)
+		stack_capture = self._stack_capture or MockTransaction.stack_capture
+		call = Call(a, kw, stack=stack_capture.mode_for(self.received_calls.total))
 		self.received_calls.append(call)
-		for act in reversed(self._acts):
-			if act._matches(call):
-				try:
-					return act._act_upon(call)
-				except ReturnValuesExhausted:
-					raise AssertionError(
-						"%r ran out of return values.\n"
-						"Received %s"
-						% (act, act.describe_reality(self.received_calls)))
+		checked = self._count(call)
+		act = self._act_for(call, checked)
+		if act is not None:
+			try:
+				return act._act_upon(call)
+			except ReturnValuesExhausted:
+				received_calls = self.received_calls
+				raise AssertionError(
+					"%r ran out of return values.\n"
+					"Received %s"
+					% (act, act.describe_reality(received_calls)))
 		else:
-			act_condition_descriptions = ["   - " + act.condition_description for act in reversed(self._acts)]
-			raise TypeError(
-				"stubbed method %r received unexpected arguments: %s\n"
-				"Allowable argument conditions are:\n%s" % (
-					self._name,
-					call.desc(),
-					"\n".join(act_condition_descriptions))
-				)
+			acts = list(reversed(self._acts))
+			def describe():
+				act_condition_descriptions = ["   - " + act.condition_description for act in acts]
+				return (
+					"stubbed method %r received unexpected arguments: %s\n"
+					"Allowable argument conditions are:\n%s" % (
+						self._name,
+						call.desc(),
+						"\n".join(act_condition_descriptions)))
+			raise LazyTypeError(describe)
 
 	def _verify(self):
+		called = self.received_calls.total > 0
+		for act in self._acts:
+			if act._verified_at_reset and not called:
+				# already verified when a nested transaction ended
+				continue
+			self._verify_act(act)
+
+	def _verify_act(self, act):
+		if not act._satisfied():
+			received_calls = self.received_calls
+			raise AssertionError(act.summary(False, received_calls))
+
+	def _save_calls(self):
+		"""
+		Set aside the calls received so far when a nested transaction begins,
+		so that it starts with fresh call counts.
+		"""
+		self._saved_calls = self.received_calls
+		self._set_received_calls(self._call_history())
+
+	def _verify_and_reset(self):
+		"""
+		Verify the calls received during a nested transaction, and then forget them
+		(restoring the calls received before it began).
+		"""
+		try:
+			for act in self._acts:
+				self._verify_act(act)
+		finally:
+			saved_calls = self._saved_calls
+			self._saved_calls = None
+			self._set_received_calls(self._call_history() if saved_calls is None else saved_calls)
+			for act in self._acts:
+				act._verified_at_reset = True
+
+	def _set_received_calls(self, calls):
+		self.received_calls = calls
 		for act in self._acts:
-			if not act._satisfied_by(self.received_calls):
-				raise AssertionError(act.summary(False, self.received_calls))
+			act._recount(calls)
 
 class NoopDelegator(object):
 	def __init__(self, delegate):
@@ -417,13 +1121,21 @@ class MockAct(object):
 	"""
 	The return type from :func:`when` and :func:`expect`.
 	"""
-	_multiplicity = None
+	_bounds = None
 	_multiplicity_description = None
+	_match_count = 0
+	_fail_fast = None
+	# whether this act's expectation was verified when a nested transaction
+	# ended, and hasn't been reconfigured since
+	_verified_at_reset = False
 	
 	_cond_args = None
+	_cond_many = None
 	_cond_description = None
+	_exact_key = None
 
 	_action = None
+	_stub = None
 
 	def __init__(self, name):
 		self.time = self.times = NoopDelegator(self)
@@ -436,23 +1148,63 @@ class MockAct(object):
 		"""
 		self.__assert_not_set(self._cond_args, "argument condition")
 		self._cond_args = self._args_equal_func(args, kwargs)
+		self._cond_many = self._args_equal_many_func(args, kwargs)
 		self._cond_description = "arguments equal to: %s" % (Call(args, kwargs),)
+		self._exact_key = _literal_key(args, kwargs)
+		self._condition_changed()
 		return self
 
+	def _condition_changed(self):
+		if self._stub is not None:
+			self._stub._acts_changed(self)
+
 	def _matches(self, call):
 		if self._cond_args is None:
 			return True
 		try:
-			return call.play(self._cond_args)
+			return self._cond_args(call.args, call.kwargs)
 		except TypeError:
 			return False
-		return True
+
+	def _matches_many(self, calls):
+		"""a list of whether each of `calls` matches this act's condition"""
+		if self._cond_args is None:
+			return [True] * len(calls)
+		if self._cond_many is not None:
+			try:
+				return self._cond_many(calls)
+			except (TypeError, ValueError):
+				pass # check each call individually, treating errors as a mismatch
+		return [self._matches(call) for call in calls]
 	
+	@property
+	def _counted(self):
+		"""whether the number of matching calls could affect verification"""
+		return self._bounds is not None and self._bounds != (0, None)
+
+	def _count_satisfies(self, count):
+		if self._bounds is None:
+			return True
+		lower, upper = self._bounds
+		return count >= lower and (upper is None or count <= upper)
+
+	def _recount(self, calls):
+		if self._counted:
+			self._match_count = sum(self._matches_many(list(calls)))
+
+	def _fails_fast(self):
+		if self._fail_fast is None:
+			return MockTransaction.fail_fast
+		return self._fail_fast
+
+	def _satisfied(self):
+		"""whether the calls counted so far satisfy this act's expectations"""
+		return self._count_satisfies(self._match_count)
+
 	def _satisfied_by(self, calls):
-		if self._multiplicity is None:
+		if self._bounds is None:
 			return True
-		matched_calls = list(filter(self._matches, calls))
-		return self._multiplicity(len(matched_calls))
+		return self._count_satisfies(sum(self._matches_many(list(calls))))
 
 	def _act_upon(self, call):
 		if self._action is None:
@@ -471,8 +1223,54 @@ class MockAct(object):
 		arguments as this method.
 		"""
 		self.__assert_not_set(self._cond_args, "argument condition")
-		self._cond_args = func
+		self._cond_args = lambda a, k: func(*a, **k)
 		self._cond_description = "where arguments satisfy the supplied function: %r" % (func,)
+		self._condition_changed()
+		return self
+
+	def with_stack(self, stack_capture):
+		"""
+		Set how much call-site information is captured for calls to
+		this stubbed method, overriding ``MockTransaction.stack_capture``. e.g:
+
+			>>> when(obj).meth.with_stack(no_stack)
+			>>> expect(obj).meth.once().with_stack(full_stack)
+
+		See :class:`~mocktest.callrecord.StackCapture`.
+		"""
+		if self._stub is None:
+			raise MockError("%r is not attached to a stubbed method" % (self,))
+		self._stub._stack_capture = stack_capture
+		return self
+
+	def with_call_history(self, call_history):
+		"""
+		Set which calls are retained in ``received_calls`` for the stubbed method
+		this act belongs to, overriding ``MockTransaction.call_history``. e.g:
+
+			>>> when(obj).meth.with_call_history(keep_calls(first=10, last=10))
+			>>> when(obj).meth.with_call_history(count_calls_only)
+
+		Expectations are verified correctly regardless of the calls retained.
+		However an expectation added after calls have been made only takes
+		into account those calls that were retained.
+		"""
+		if self._stub is None:
+			raise MockError("%r is not attached to a stubbed method" % (self,))
+		self._stub._set_call_history(call_history)
+		return self
+
+	def fail_fast(self, enabled=True):
+		"""
+		Fail as soon as this act is matched more times than its expectation
+		allows (e.g. with :func:`exactly`, :func:`at_most` or :func:`between`),
+		rather than waiting until the end of the test. The AssertionError is
+		raised from the offending call, so its traceback points at the caller.
+		This overrides ``MockTransaction.fail_fast``. e.g:
+
+			>>> expect(obj).retry.at_most(3).times().fail_fast()
+		"""
+		self._fail_fast = enabled
 		return self
 
 	def exactly(self, n):
@@ -481,28 +1279,26 @@ class MockAct(object):
 		Usually followed by `times()` for readability, as in:
 			>>> expect(obj).meth.exactly(3).times()
 		"""
-		self._multiplicity = lambda x: x == n
-		self._multiplicity_description = "exactly %s" % (n,)
-		return self
+		return self._set_bounds(n, n, "exactly %s" % (n,))
 	
 	def at_least(self, n):
 		"""Expect this act to match at least `number` times."""
-		self._multiplicity = lambda x: x >= n
-		self._multiplicity_description = "at least %s" % (n,)
-		return self
+		return self._set_bounds(n, None, "at least %s" % (n,))
 	
 	def at_most(self, n):
 		"""Expect this act to match at most `number` times."""
-		self._multiplicity = lambda x: x <= n
-		self._multiplicity_description = "at most %s" % (n,)
-		return self
+		return self._set_bounds(0, n, "at most %s" % (n,))
 	
 	def between(self, start_range, end_range):
 		"""Expect this act to match between `lower` and `upper` times."""
-		self._multiplicity = lambda x: x >= start_range and x <= end_range
-		self._multiplicity_description = "between %s and %s" % (start_range, end_range)
-		return self
+		return self._set_bounds(start_range, end_range, "between %s and %s" % (start_range, end_range))
 	
+	def _set_bounds(self, lower, upper, description):
+		self._bounds = (lower, upper)
+		self._multiplicity_description = description
+		self._condition_changed()
+		return self
+
 	def never(self):
 		"""Alias for exactly(0).times"""
 		return self.exactly(0)
@@ -523,79 +1319,43 @@ class MockAct(object):
 		if var is not None:
 			raise MockError("%s has already been set" % (msg,))
 
-	def _match_or_equal(self, expected, actual):
-		if isinstance(expected, Matcher):
-			return expected.matches(actual)
-		return actual == expected
-
 	def _args_equal_func(self, args, kwargs):
 		"""
-		returns a function that returns whether its arguments match the
-		args (tuple), and its keyword arguments match the kwargs (dict)
+		returns a function of (args, kwargs) that returns whether its arguments
+		match the args (tuple), and its keyword arguments match the kwargs (dict)
 		"""
-		def check_args(a, args):
-			try:
-				splat_pos = [isinstance(x, SplatMatcher) for x in args].index(True)
-			except ValueError:
-				splat_pos = None
-
-			if splat_pos is not None:
-				expected_leading_args = args[:splat_pos]
-				leading_args = a[:splat_pos]
-				leading_match = check_args(leading_args, expected_leading_args)
-				if not leading_match:
-					return False
+		check_args = _compile_positional(args)
+		check_kwargs = _compile_keywords(kwargs)
+		if not kwargs:
+			return lambda a, k: not k and check_args(a)
+		return lambda a, k: check_args(a) and check_kwargs(k)
 
-				#TODO: support trailing args in py3
-				assert splat_pos == len(args)-1
-
-				splattable_args = a[splat_pos:]
-				splat_item = args[splat_pos]
-				return splat_item.matches(splattable_args, {})
-
-			if not len(a) == len(args):
-				return False
-
-			for expected, actual in zip(args, a):
-				if not self._match_or_equal(expected, actual):
-					return False
-			return True
-			
-		def check_kwargs(k, kwargs):
-			kwargs = kwargs.copy()
-			wildcard_kwargs_matcher = kwargs.pop('__kwargs', None)
-			if wildcard_kwargs_matcher is not None:
-				def splitdict(d, keys):
-					included, others = {}, {}
-					for k, v in d.items():
-						if k in keys:
-							included[k] = v
-						else:
-							others[k] = v
-					return included, others
-
-				explicit_kwargs, wildcard_kwargs = splitdict(k, list(kwargs.keys()))
-				return check_kwargs(explicit_kwargs, kwargs) and wildcard_kwargs_matcher.matches(wildcard_kwargs)
-
-			if not len(k) == len(kwargs):
-				return False
-
-			if set(kwargs.keys()) != set(k.keys()):
-				return False
-				
-			for key in kwargs.keys():
-				if not self._match_or_equal(kwargs[key], k[key]):
-					return False
-			return True
-
-		def check(*a, **k):
-			return check_args(a, args) and check_kwargs(k, kwargs)
-		return check
-	
-	def _equals_or_matches(self, expected, actual):
-		if isinstance(expected, Matcher):
-			return expected.matches(actual)
-		return expected == actual
+	def _args_equal_many_func(self, args, kwargs):
+		"""
+		returns a function of (calls) that returns a list of whether each call's
+		arguments match (args, kwargs), checking each matcher against many calls at once.
+		Returns None if the arguments include a splat matcher.
+		"""
+		if any(isinstance(arg, SplatMatcher) for arg in args):
+			return None
+		check_args_many = _compile_fixed_many(args)
+		check_kwargs = _compile_keywords(kwargs)
+		def check_many(calls):
+			kwargs_list = list(map(_call_kwargs, calls))
+			arg_tuples = list(map(_call_args, calls))
+			indexes = range(len(calls))
+			if kwargs or any(kwargs_list):
+				if kwargs:
+					kwargs_ok = [check_kwargs(k or {}) for k in kwargs_list]
+				else:
+					kwargs_ok = [not k for k in kwargs_list]
+				indexes = list(itertools.compress(indexes, kwargs_ok))
+				arg_tuples = list(itertools.compress(arg_tuples, kwargs_ok))
+			mask = [False] * len(calls)
+			for n in check_args_many(arg_tuples):
+				mask[indexes[n]] = True
+			return mask
+		return check_many
 
 	def summary(self, matched=None, call_list=None):
 		return "Mock \"%s\" %s expectations:\n expected %s\n %s" % (
@@ -615,15 +1375,22 @@ class MockAct(object):
 			desc += " with %s" % (self._cond_description)
 		return desc
 	
+	_report_limit = 10
+
 	def describe_reality(self, call_list):
-		call_count = len(call_list)
-		desc = "%s calls" % (call_count,)
-		if call_count > 0:
-			desc += " with arguments:"
-			i = 1
-			for arg_set in call_list:
-				desc += "\n  %s:   %s" % (i, arg_set)
-				i += 1
+		if MockTransaction.full_reports:
+			return describe_calls(call_list, limit=None)
+		desc = describe_calls(call_list, limit=self._report_limit)
+		report_dir = MockTransaction.report_dir
+		total = getattr(call_list, 'total', len(call_list))
+		if report_dir is not None and total > 2 * self._report_limit:
+			fd, path = tempfile.mkstemp(
+				prefix="mocktest-%s-" % (re.sub(r'\W', '_', self._name),),
+				suffix=".txt",
+				dir=report_dir)
+			os.close(fd)
+			dump_calls(call_list, path)
+			desc += "\n  full list of calls: %s" % (path,)
 		return desc
 
 	def and_return(self, val, *subsequent_vals):
@@ -654,18 +1421,31 @@ class MockAct(object):
 		Both `and_` and `then_` versions have the same effect however.
 		"""
 		if subsequent_vals:
-			vals = [val] + list(subsequent_vals)
-			def action(*a, **k):
-				try:
-					return vals.pop(0)
-				except IndexError:
-					raise ReturnValuesExhausted()
- 
-			self._action = action
-		else:
-			self._action = lambda *a, **k: val
+			return self.and_return_from((val,) + subsequent_vals)
+		self._action = lambda *a, **k: val
 		return self
 	then_return = and_return
+
+	def and_return_from(self, iterable):
+		"""
+		When this act matches, return the next value from `iterable`.
+		Values are only taken from `iterable` as they are needed, so this
+		can be used with generators and other (possibly infinite) iterators. e.g:
+
+			>>> when(obj).read_record().then_return_from(records_in('fixture.csv'))
+
+		Once `iterable` is exhausted, any further calls will fail just as with
+		:func:`and_return`.
+		"""
+		vals = iter(iterable)
+		def action(*a, **k):
+			try:
+				return next(vals)
+			except StopIteration:
+				raise ReturnValuesExhausted()
+		self._action = action
+		return self
+	then_return_from = and_return_from
 	
 	def and_call(self, func):
 		"""When this act matches, call the given `func` and return its value."""
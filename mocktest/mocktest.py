@@ -16,6 +16,7 @@ import re
 import sys
 from . import core
 from .mocking import _special_method
+from .callrecord import short_repr
 import types
 from functools import wraps
 import collections
@@ -276,7 +277,11 @@ class TestCase(unittest.TestCase):
 		Fail the test if an object does not satisfy the given matcher.
 		"""
 		if not matcher.matches(val):
-			fail_msg = "expected:\n%r\nto be %s" % (val, matcher.desc())
+			mismatch = matcher.describe_mismatch(val)
+			if mismatch is None:
+				fail_msg = "expected:\n%r\nto be %s" % (val, matcher.desc())
+			else:
+				fail_msg = "expected:\n%s\nto be %s\nbut %s" % (short_repr(val), matcher.desc(), mismatch)
 			if message is not None:
 				fail_msg += "\n(%s)" % (message,)
 			self.fail(fail_msg)
@@ -1,40 +1,381 @@
 from .mockerror import MockError
+from .callrecord import lazy_stack, keep_all_calls
+import threading
+try:
+	import contextvars
+except ImportError:
+	contextvars = None # py2, <3.7
 
 __unittest = True
 
 __all__ = ['MockTransaction']
 
+class _ThreadLocalVar(object):
+	"""a stand-in for contextvars.ContextVar, scoped per-thread"""
+	def __init__(self, name, default=None):
+		self._local = threading.local()
+		self._default = default
+
+	def get(self):
+		return getattr(self._local, 'value', self._default)
+
+	def set(self, value):
+		self._local.value = value
+
+def _context_var(name):
+	if contextvars is None:
+		return _ThreadLocalVar(name, default=None)
+	return contextvars.ContextVar(name, default=None)
+
+class _Transaction(object):
+	"""the state of a single active transaction"""
+	def __init__(self, parent, settings):
+		self.parent = parent
+		# a copy of the enclosing transaction's settings (see _MockTransaction)
+		self.settings = dict(settings)
+		self.teardown_actions = []
+		self.savepoint_actions = []
+		self.reset_actions = []
+		# (id(obj), name) -> (obj, stub) for each method stubbed in this transaction
+		self.stubs = {}
+		# (id(obj), kind) -> _Journal for each object modified via a journal
+		self.journals = {}
+
+	def ancestors(self):
+		"""the transactions enclosing this one (innermost first)"""
+		transaction = self.parent
+		while transaction is not None:
+			yield transaction
+			transaction = transaction.parent
+
+	def owns(self, transaction):
+		"""whether `transaction` is this transaction or encloses it"""
+		return transaction is self or any(t is transaction for t in self.ancestors())
+
+# Shared objects (modules, classes, etc) modified by any active transaction,
+# keyed by (id(obj), kind, name). Each value is (transaction, obj) - `obj`
+# is kept to ensure its id is not reused while it is claimed.
+_claims = {}
+_claims_lock = threading.Lock()
+
+def _claim(transaction, obj, kind, name):
+	"""claim (kind, name) of `obj` for `transaction`, returning the claim's key (or None if already claimed)"""
+	key = (id(obj), kind, name)
+	with _claims_lock:
+		claim = _claims.get(key)
+		if claim is not None:
+			if transaction.owns(claim[0]):
+				return None
+			raise MockError("%s %r of %r is already modified by another transaction" % (kind, name, obj))
+		_claims[key] = (transaction, obj)
+	return key
+
+def _release(keys):
+	with _claims_lock:
+		for key in keys:
+			_claims.pop(key, None)
+
+_MISSING = object()
+
+class _Journal(object):
+	"""
+	Records the original value of each item (or attribute) of a single
+	object changed during a transaction, so that they can all be restored
+	in one pass when the transaction ends.
+	"""
+	__slots__ = ('obj', 'kind', 'settable', 'transaction', 'originals', 'claims')
+
+	def __init__(self, transaction, obj, kind, settable):
+		self.transaction = transaction
+		self.obj = obj
+		self.kind = kind
+		self.settable = settable
+		self.originals = {}
+		self.claims = []
+
+	def set(self, name, value):
+		"""set `name` to `value` on the journaled object, recording its original value if it's the first change"""
+		originals = self.originals
+		if name not in originals:
+			key = _claim(self.transaction, self.obj, self.kind, name)
+			if key is not None:
+				self.claims.append(key)
+			settable = self.settable
+			try:
+				originals[name] = settable.get(self.obj, name)
+			except settable.error:
+				originals[name] = _MISSING
+		self.settable.set(self.obj, name, value)
+
+	def revert(self):
+		obj, settable = self.obj, self.settable
+		try:
+			restore = {}
+			for name, value in self.originals.items():
+				if value is _MISSING:
+					try:
+						settable.delete(obj, name)
+					except settable.error:
+						pass
+				else:
+					restore[name] = value
+			if self.kind == 'item' and hasattr(obj, 'update'):
+				obj.update(restore)
+			else:
+				for name, value in restore.items():
+					settable.set(obj, name, value)
+		finally:
+			_release(self.claims)
+
 class _MockTransaction(object):
 	"""
 	A context manager to encapsulate a single mocktest transaction.
 
-	**Note**: this is a global context manager - you
-	cannot have more than one.
+	**Note**: there is a single global MockTransaction, but the active
+	transaction is tracked per execution context (using :mod:`contextvars`,
+	or per-thread on older pythons). So separate threads or asyncio tasks
+	may each run their own transaction concurrently, although each can
+	only have one transaction in progress at a time.
+
+	If two concurrent transactions modify the same attribute or item of
+	a shared object (e.g. by stubbing a method on a module), a
+	:class:`~mocktest.mockerror.MockError` is raised in the second.
+
+	Transactions may be nested. Entering MockTransaction while a transaction
+	is already in progress starts a savepoint, and exiting it rolls back only
+	what was added since then. This allows an expensive set of stubs to be
+	built once (e.g. in ``setUpClass``), with each test running in its own
+	nested transaction:
+
+		>>> MockTransaction.__enter__()
+		>>> when(os).system.then_return(0)
+		>>> with MockTransaction:
+		... 	expect(os).system('ls').once()
+		... 	os.system('ls')
+		>>> MockTransaction.__exit__()
+
+	When a nested transaction begins, stubs from the transaction directly
+	enclosing it set aside the calls they have received so far, so that
+	their call counters (and ``received_calls``) only count calls made
+	within the nested transaction. When it ends, their expectations are
+	verified against those calls, and the calls set aside are restored.
+	Stubs from transactions further out are verified when the transaction
+	nested directly inside their own one ends.
+
+	The settings below belong to the current transaction: a new transaction
+	starts with those of the transaction enclosing it, and changes made
+	within a transaction are discarded when it ends (so concurrent
+	transactions may each use their own). Settings changed while no
+	transaction is in progress become the defaults for new transactions.
+
+	.. data:: stack_capture
+
+		The :class:`~mocktest.callrecord.StackCapture` policy used by stubs
+		that don't specify their own (default: ``lazy_stack``). e.g. to make
+		stubbed calls as cheap as possible:
+
+			>>> MockTransaction.stack_capture = no_stack
+
+	.. data:: call_history
+
+		The policy deciding which calls are retained in each stub's
+		``received_calls``: ``keep_all_calls`` (the default),
+		``keep_calls(first=N, last=M)`` or ``count_calls_only``.
+		Every call is still counted towards expectations, regardless of
+		which calls are retained. e.g:
+
+			>>> MockTransaction.call_history = keep_calls(first=100, last=100)
+
+	.. data:: full_reports
+
+		Failure reports for stubs that received many calls only list the
+		first and last few calls, along with a summary of the distinct
+		arguments received. Set this to True to list every call instead
+		(default: False).
+
+	.. data:: report_dir
+
+		If set to a directory, failure reports that don't list every call
+		also write the full list of calls to a file in this directory,
+		and include its path in the report (default: None).
+
+	.. data:: fail_fast
+
+		When True, an expectation that has been exceeded (e.g. a method
+		expected ``at_most(3)`` times being called a fourth time) raises an
+		AssertionError from the offending call, instead of only being reported
+		when the transaction ends (default: False). See
+		:func:`~mocktest.mocking.MockAct.fail_fast`.
+
+	.. data:: mock_max_depth
+	.. data:: mock_max_nodes
+
+		The default limits on the depth, and total number of nodes, of the
+		tree of children automatically created by each :func:`~mocktest.mocking.mock`.
+		Exceeding either raises a :class:`~mocktest.mockerror.MockError`
+		(default: None, meaning unlimited). See :func:`~mocktest.mocking.mock`.
 	"""
 	def __init__(self):
-		self.teardown_actions = None
-		self.started = False
+		self._current = _context_var('mocktest_transaction')
+		self._defaults = {
+			'stack_capture': lazy_stack,
+			'fail_fast': False,
+			'call_history': keep_all_calls,
+			'full_reports': False,
+			'report_dir': None,
+			'mock_max_depth': None,
+			'mock_max_nodes': None,
+		}
+
+	def _setting(name):
+		def get(self):
+			transaction = self._current.get()
+			return (self._defaults if transaction is None else transaction.settings)[name]
+		def set(self, value):
+			transaction = self._current.get()
+			(self._defaults if transaction is None else transaction.settings)[name] = value
+		return property(get, set)
+
+	stack_capture = _setting('stack_capture')
+	fail_fast = _setting('fail_fast')
+	call_history = _setting('call_history')
+	full_reports = _setting('full_reports')
+	report_dir = _setting('report_dir')
+	mock_max_depth = _setting('mock_max_depth')
+	mock_max_nodes = _setting('mock_max_nodes')
+	del _setting
+
+	@property
+	def started(self):
+		"""whether a transaction is in progress (in the current context)"""
+		return self._current.get() is not None
+
+	@property
+	def current(self):
+		"""the innermost transaction in progress (in the current context), or None"""
+		return self._current.get()
+
+	@property
+	def teardown_actions(self):
+		transaction = self._current.get()
+		return None if transaction is None else transaction.teardown_actions
+
+	def _require_current(self):
+		transaction = self._current.get()
+		if transaction is None:
+			raise MockError("MockTransaction is not in progress!")
+		return transaction
 
 	def add_teardown(self, func):
-		self.teardown_actions.append(func)
+		self._require_current().teardown_actions.append(func)
+
+	def add_savepoint(self, func):
+		"""
+		Add an action to be run whenever a transaction nested directly
+		inside the current one begins.
+		"""
+		self._require_current().savepoint_actions.append(func)
+
+	def add_reset(self, func):
+		"""
+		Add an action to be run whenever a transaction nested directly
+		inside the current one ends (after the nested transaction's teardowns).
+		"""
+		self._require_current().reset_actions.append(func)
+
+
+	def register_stub(self, obj, name, stub):
+		"""record that `obj.name` has been replaced with `stub` in the current transaction"""
+		self._require_current().stubs[(id(obj), name)] = (obj, stub)
+
+	def stub_for(self, obj, name):
+		"""
+		The stub registered for `obj.name` in the current transaction
+		(or one of its enclosing transactions), or None
+		"""
+		key = (id(obj), name)
+		transaction = self._require_current()
+		while transaction is not None:
+			entry = transaction.stubs.get(key)
+			if entry is not None:
+				return entry[1]
+			transaction = transaction.parent
+		return None
+
+	def active_stubs(self):
+		"""
+		A list of (obj, name, stub) for every method stubbed in the current
+		transaction and its enclosing transactions (outermost first).
+		Useful for diagnostics.
+		"""
+		transactions = []
+		transaction = self._current.get()
+		while transaction is not None:
+			transactions.insert(0, transaction)
+			transaction = transaction.parent
+		return [(obj, name, stub)
+			for transaction in transactions
+			for (_, name), (obj, stub) in transaction.stubs.items()]
+
+	def claim(self, obj, kind, name):
+		"""
+		Register that the current transaction is modifying `name` (of the
+		given `kind`, e.g. 'attr' or 'item') on `obj`, to be released when it
+		ends. Raises MockError if another transaction (which is not enclosing
+		the current one) has already claimed it.
+		"""
+		transaction = self._require_current()
+		key = _claim(transaction, obj, kind, name)
+		if key is not None:
+			transaction.teardown_actions.append(lambda: _release((key,)))
+
+	def journal(self, obj, kind, settable):
+		"""
+		The journal used to modify `obj` in the current transaction (creating it
+		if necessary). Each (kind, name) changed via ``journal.set(name, value)`` is
+		claimed, and reverted to its original value when the transaction ends.
+		This costs a single teardown action per object, rather than per change.
+
+		`settable` provides get / set / delete functions (and an error type) for `kind`.
+		"""
+		transaction = self._require_current()
+		key = (id(obj), kind)
+		journal = transaction.journals.get(key)
+		if journal is None:
+			journal = transaction.journals[key] = _Journal(transaction, obj, kind, settable)
+			transaction.teardown_actions.append(journal.revert)
+		return journal
 	
 	def __enter__(self):
-		"""begin a new transaction"""
-		if self.started: raise MockError("MockTransaction started while already in progress!")
-		self.teardown_actions = []
-		self.started = True
+		"""begin a new transaction (nested inside the current one, if any)"""
+		parent = self._current.get()
+		settings = self._defaults if parent is None else parent.settings
+		if parent is not None:
+			for action in parent.savepoint_actions:
+				action()
+		self._current.set(_Transaction(parent, settings))
 
 	def __exit__(self, *optional_err_info):
 		"""end the current transaction, resetting all mocks and verifying all expectations"""
-		if not self.started: raise MockError("MockTransaction is not in progress!")
+		transaction = self._require_current()
 		errors = []
-		for action in reversed(self.teardown_actions):
+		actions = list(reversed(transaction.teardown_actions))
+		if transaction.parent is not None:
+			# only the level being returned to: stubs further out keep counting
+			# until the transaction directly inside their own one ends
+			actions.extend(transaction.parent.reset_actions)
+		for action in actions:
 			try:
 				action()
 			except Exception as e:
 				errors.append(e)
-		self.teardown_actions = None
-		self.started = False
+		transaction.teardown_actions = None
+		transaction.savepoint_actions = None
+		transaction.reset_actions = None
+		transaction.stubs = None
+		transaction.journals = None
+		transaction.settings = None
+		self._current.set(transaction.parent)
 		if errors:
 			raise errors[0]
 		return False
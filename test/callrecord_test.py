@@ -0,0 +1,179 @@
+from unittest import TestCase, skipIf
+from mocktest.callrecord import *
+try:
+	import numpy
+except ImportError:
+	numpy = None
+
+class CallHistoryTest(TestCase):
+	def history_of(self, count, first, last, index=False):
+		history = keep_calls(first=first, last=last, index=index)()
+		for i in range(count):
+			history.append(Call.like(i))
+		return history
+
+	def test_should_retain_first_and_last_calls(self):
+		history = self.history_of(10, first=2, last=3)
+		self.assertEqual(history.total, 10)
+		self.assertEqual(history.omitted, 5)
+		self.assertEqual(len(history), 5)
+		self.assertEqual(history, [Call.like(i) for i in (0, 1, 7, 8, 9)])
+		self.assertEqual(history[-1], Call.like(9))
+		self.assertEqual([i for i, call in history.numbered()], [1, 2, 8, 9, 10])
+
+	def test_should_retain_everything_when_within_bounds(self):
+		history = self.history_of(3, first=2, last=3)
+		self.assertEqual(history.omitted, 0)
+		self.assertEqual([i for i, call in history.numbered()], [1, 2, 3])
+
+	def test_should_only_count_calls(self):
+		history = count_calls_only()
+		for i in range(5):
+			history.append(Call.like(i))
+		self.assertEqual(history.total, 5)
+		self.assertEqual(list(history), [])
+
+	def test_should_index_every_call_received(self):
+		history = self.history_of(10, first=1, last=1, index=True)
+		history.append(Call.like(3))
+		self.assertEqual(history.count_of(3), 2)
+		self.assertEqual(history.count_of(4), 1)
+		self.assertEqual(history.count_of(10), 0)
+		self.assertEqual(history.distinct(), 10)
+		self.assertEqual(history.histogram()[Call.like(3)], 2)
+
+	def test_should_query_calls_with_matchers(self):
+		from mocktest.matchers import any_int, any_string
+		calls = keep_all_calls()
+		for i in range(5):
+			calls.append(Call.like(i))
+		calls.append(Call.like('str'))
+		calls.append(Call.like('str', x=1))
+		self.assertEqual(calls.count_where(any_int), 5)
+		self.assertEqual(calls.count_where(any_string), 1)
+		self.assertEqual(calls.count_where(any_string, x=1), 1)
+		self.assertEqual(calls.calls_where(any_string), [Call.like('str')])
+
+	def test_should_query_calls_of_different_shapes_with_matchers(self):
+		from mocktest.matchers import any_int, any_string, string_matching
+		calls = keep_all_calls()
+		for call in [Call.like(1, 'a'), Call.like(1), Call.like(2, 'b', x=1), Call.like('c', 'd'),
+				Call.like(3, 'e'), Call.like(4, 5), Call.like(1, 'a')]:
+			calls.append(call)
+		self.assertEqual(calls.count_where(any_int, any_string), 3)
+		self.assertEqual(calls.calls_where(1, any_string), [Call.like(1, 'a'), Call.like(1, 'a')])
+		self.assertEqual(calls.calls_where(any_int, any_string, x=any_int), [Call.like(2, 'b', x=1)])
+		# a matcher raising TypeError for some arguments doesn't match them
+		self.assertEqual(calls.calls_where(any_int, string_matching('[ae]')),
+			[Call.like(1, 'a'), Call.like(3, 'e'), Call.like(1, 'a')])
+
+	def test_should_index_calls_with_unhashable_arguments_by_content(self):
+		calls = keep_all_calls()
+		for i in range(100):
+			calls.append(Call.like({'i': i}, [i]))
+		calls.append(Call.like({'i': 1}, [1]))
+		self.assertEqual(calls.count_of({'i': 1}, [1]), 2)
+		self.assertEqual(len(set(hash(key) for key in calls._index)), 100)
+		self.assertEqual(calls.count_of({'i': 1}, [2]), 0)
+		self.assertEqual(calls.distinct(), 100)
+
+	def test_should_group_opaque_arguments_only_when_queried(self):
+		class Opaque(object):
+			__hash__ = None
+			def __init__(self, value):
+				self.value = value
+			def __eq__(self, other):
+				return isinstance(other, Opaque) and other.value == self.value
+		calls = keep_calls(first=1, last=1, index=True)()
+		for value in (1, 2, 1):
+			calls.append(Call.like(Opaque(value)))
+		calls.append(Call.like([Opaque(1)]))
+		self.assertEqual(len(calls._index), 1)
+		self.assertEqual(calls.count_of(Opaque(1)), 2)
+		self.assertEqual(calls.count_of(Opaque(3)), 0)
+		self.assertEqual(calls.distinct(), 3)
+		self.assertEqual(calls._pending, [])
+
+	def test_call_list_should_index_calls_when_first_queried(self):
+		calls = keep_all_calls()
+		calls.append(Call.like(1))
+		calls.extend([Call.like(1), Call.like(2)])
+		self.assertEqual(calls._index, None)
+		self.assertEqual(calls.count_of(1), 2)
+		calls += [Call.like(2)]
+		calls.append(Call.like(3))
+		self.assertEqual(calls.histogram(), {Call.like(1): 2, Call.like(2): 2, Call.like(3): 1})
+		calls.insert(0, Call.like(3))
+		calls[1] = Call.like(4)
+		del calls[-1]
+		self.assertEqual(calls.histogram(), {Call.like(1): 1, Call.like(2): 2, Call.like(3): 1, Call.like(4): 1})
+		calls[1:3] = [Call.like(5)]
+		calls.pop()
+		self.assertEqual(calls.histogram(), {Call.like(2): 1, Call.like(3): 1, Call.like(5): 1})
+
+	def test_count_only_history_should_not_index_calls(self):
+		from mocktest.mockerror import MockError
+		history = count_calls_only()
+		history.append(Call.like(1))
+		self.assertRaises(MockError, lambda: history.count_of(1))
+
+	def test_bounded_history_should_not_keep_calls_outside_its_bounds(self):
+		import weakref
+		from mocktest.mockerror import MockError
+		class Arg(object): pass
+		history = keep_calls(first=1, last=1)()
+		args = [Arg() for i in range(5)]
+		refs = [weakref.ref(arg) for arg in args]
+		for arg in args:
+			history.append(Call.like(arg))
+		del args, arg
+		self.assertEqual([ref() is not None for ref in refs], [True, False, False, False, True])
+		self.assertRaises(MockError, lambda: history.count_of(1))
+
+	def test_call_list_should_keep_every_call(self):
+		calls = keep_all_calls()
+		calls.append(Call.like(1))
+		self.assertEqual(calls.total, 1)
+		self.assertEqual(calls, [Call.like(1)])
+
+class CallTest(TestCase):
+	def test_should_be_compact(self):
+		call = Call.like(1, x=2)
+		self.assertFalse(hasattr(call, '__dict__'))
+
+	def test_should_compare_to_calls_and_tuples(self):
+		self.assertEqual(Call.like(1, x=2), Call.like(1, x=2))
+		self.assertEqual(Call.like(1, x=2), ((1,), {'x': 2}))
+		self.assertNotEqual(Call.like(1, x=2), Call.like(1))
+		self.assertEqual(Call.like(1).tuple, ((1,), {}))
+		self.assertEqual(Call((1,), {}).kwargs, {})
+		self.assertTrue(Call.like().empty)
+		self.assertFalse(Call.like(x=1).empty)
+
+	def test_should_be_hashable(self):
+		calls = set([Call.like(1, x=2), Call.like(1, x=2), Call.like(1), Call.like(x=2, y=3)])
+		self.assertEqual(len(calls), 3)
+		self.assertTrue(Call.like(y=3, x=2) in calls)
+		self.assertEqual(Call.like(1, x=2).key, ((1,), (('x', 2),)))
+
+	def test_should_hash_unhashable_arguments_by_equality(self):
+		calls = set([Call.like([1, 2]), Call.like([1, 2], x={}), Call.like([1, 2])])
+		self.assertEqual(len(calls), 2)
+		self.assertTrue(Call.like([1, 2], x={}) in calls)
+		self.assertFalse(Call.like([1, 3]) in calls)
+
+	@skipIf(numpy is None, "numpy is not installed")
+	def test_should_compare_and_group_calls_with_array_arguments(self):
+		calls = keep_all_calls()
+		for values in ([1, 2], [3, 4], [1, 2]):
+			calls.append(Call.like(numpy.array(values), x=numpy.array(values)))
+		self.assertTrue(calls[0] == calls[2])
+		self.assertFalse(calls[0] == calls[1])
+		self.assertEqual(len(set(calls)), 2)
+		self.assertEqual(sorted(calls.histogram().values()), [1, 2])
+		self.assertEqual(calls.count_of(numpy.array([1, 2]), x=numpy.array([1, 2])), 2)
+
+	def test_should_play_and_describe(self):
+		self.assertEqual(Call.like(1, x=2).play(lambda *a, **k: (a, k)), ((1,), {'x': 2}))
+		self.assertEqual(Call.like(1, x=2).desc(), "(1, x=2)")
+		self.assertEqual(repr(Call.like(1)), "<#Call: ((1,), {})>")
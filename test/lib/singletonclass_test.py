@@ -9,6 +9,10 @@ class SomeClass(str):
 	def __str__(self): return str(self.val)
 	def __repr__(self): return repr(self.val)
 
+class SlottedClass(object):
+	__slots__ = ('val',)
+	def __len__(self): return 0
+
 class SingletonClassTest(TestCase):
 	def test_singleton_classes_should_be_created_and_destroyed(self):
 		f = SomeClass('str')
@@ -48,3 +52,41 @@ class SingletonClassTest(TestCase):
 
 
 
+
+	def test_singleton_classes_should_be_reused_after_teardown(self):
+		f = SomeClass('str')
+		g = SomeClass('another str')
+		with mocktest.MockTransaction:
+			ensure_singleton_class(f)
+			ensure_singleton_class(g)
+			singleton_classes = set([type(f), type(g)])
+
+		for i in range(3):
+			with mocktest.MockTransaction:
+				mocktest.when(g).__len__().then_return(i)
+				mocktest.when(f)['__str__'].then_return('stubbed')
+				self.assertTrue(type(f) in singleton_classes)
+				self.assertTrue(type(g) in singleton_classes)
+				self.assertEqual(str(f), 'stubbed')
+				self.assertEqual(len(g), i)
+			self.assertTrue(type(f) is SomeClass)
+			self.assertEqual(str(f), 'str')
+			self.assertEqual(len(g), len('another str'))
+
+	def test_reused_singleton_classes_should_not_retain_stubbed_attributes(self):
+		f = SomeClass('str')
+		with mocktest.MockTransaction:
+			mocktest.when(f)['__str__'].then_return('stubbed')
+			mocktest.when(f).__call__().then_return('called')
+		g = SomeClass('another str')
+		with mocktest.MockTransaction:
+			ensure_singleton_class(g)
+			self.assertEqual(str(g), 'another str')
+			self.assertFalse(callable(g))
+
+	def test_singleton_class_should_support_slotted_classes(self):
+		f = SlottedClass()
+		with mocktest.MockTransaction:
+			mocktest.when(f).__len__().then_return(3)
+			self.assertEqual(len(f), 3)
+		self.assertTrue(type(f) is SlottedClass)
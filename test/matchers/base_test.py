@@ -1,6 +1,10 @@
-from unittest import TestCase
+from unittest import TestCase, skipIf
 
 from mocktest.matchers import *
+try:
+	import numpy
+except ImportError:
+	numpy = None
 
 class BaseTest(TestCase):
 	def test_should_have_str_and_repr(self):
@@ -21,3 +25,87 @@ class BaseTest(TestCase):
 	
 	def test_splat_matcher_should_have_a_meaningful_description(self):
 		self.assertEquals(repr(*any_args), "args like [\'any object\']")
+
+	def test_matchers_should_combine_with_and_or_and_not(self):
+		positive = matcher(lambda self, x: x > 0, 'a positive number')
+		self.assertTrue((any_int & positive).matches(3))
+		self.assertFalse((any_int & positive).matches(-3))
+		self.assertFalse((any_int & positive).matches(3.0))
+		self.assertTrue((any_int | any_string).matches('s'))
+		self.assertFalse((any_int | any_string).matches(1.0))
+		self.assertTrue((~any_int).matches('s'))
+		self.assertFalse((~any_int).matches(1))
+		self.assertTrue(~~any_int is any_int)
+
+	def test_combined_matchers_should_be_flattened_and_described(self):
+		combined = any_int & (any_string | Any(float)) & (string_containing('x') & Not(any_list))
+		self.assertEqual(len(combined.matchers), 4)
+		self.assertEqual(combined.desc(),
+			'any instance of int and (any instance of str or any instance of float) and '
+			'a string containing: x and not any instance of list')
+
+	def test_negated_combined_matchers_should_be_parenthesised(self):
+		self.assertEqual((~(any_int | any_string)).desc(), 'not (any instance of int or any instance of str)')
+		self.assertEqual((~any_int | any_string).desc(), 'not any instance of int or any instance of str')
+
+	def test_combined_matchers_should_check_cheapest_matchers_first_and_short_circuit(self):
+		checked = []
+		def checking(name, result):
+			def matches(self, x):
+				checked.append(name)
+				return result
+			return matcher(matches, name)
+		self.assertFalse((checking('expensive', True) & string_matching('a') & Any(str)).matches(1))
+		self.assertEqual(checked, [])
+		self.assertTrue((checking('expensive', True) | string_containing('a')).matches('abc'))
+		self.assertEqual(checked, [])
+		self.assertFalse((checking('first', False) & checking('second', True)).matches('abc'))
+		self.assertEqual(checked, ['first'])
+
+	def test_matchers_should_match_many_objects(self):
+		positive = matcher(lambda self, x: x > 0, 'a positive number')
+		self.assertEqual(positive.matches_many([1, -1, 2]), [True, False, True])
+		self.assertEqual(positive.first_mismatch([1, -1, 2]), 1)
+		self.assertEqual(positive.first_mismatch([]), None)
+		self.assertEqual(Any.matches_many(['a', None]), [True, True])
+		self.assertEqual(Not(any_int).matches_many([1, 'a']), [False, True])
+
+	def test_combined_matchers_should_match_many_objects(self):
+		checked = []
+		def positive(self, x):
+			checked.append(x)
+			return x > 0
+		positive_int = any_int & matcher(positive)
+		self.assertEqual(positive_int.matches_many([1, 'a', -1, 2.0, 3]), [True, False, False, False, True])
+		# only the objects that passed the cheaper type check are checked
+		self.assertEqual(checked, [1, -1, 3])
+		self.assertEqual((any_string | matcher(positive)).matches_many([1, 'a', -1]), [True, True, False])
+		self.assertEqual(positive_int.first_mismatch([1, 3, -1]), 2)
+
+	def test_matchers_should_not_combine_with_other_types(self):
+		self.assertRaises(TypeError, lambda: any_int & 1)
+		self.assertRaises(TypeError, lambda: any_int | None)
+
+@skipIf(numpy is None, "numpy is not installed")
+class NumpyMatchingTest(TestCase):
+	def test_type_matcher_should_match_arrays(self):
+		mask = any_float.matches_many(numpy.array([1.0, 2.0]))
+		self.assertTrue(isinstance(mask, numpy.ndarray))
+		self.assertEqual(mask.tolist(), [True, True])
+		self.assertEqual(any_string.matches_many(numpy.array([1.0, 2.0])).tolist(), [False, False])
+		self.assertEqual(any_int.matches_many(numpy.array([1, 'a'], dtype=object)), [True, False])
+
+	def test_item_matcher_should_match_arrays(self):
+		mask = any_of([1, 3]).matches_many(numpy.array([1, 2, 3]))
+		self.assertEqual(mask.tolist(), [True, False, True])
+		self.assertEqual(any_of([1, 3]).first_mismatch(numpy.array([1, 2, 3])), 1)
+		self.assertEqual(any_of([1, 'a']).matches_many(numpy.array([1, 2])), [True, False])
+
+	def test_substring_matcher_should_match_arrays(self):
+		mask = string_containing('b').matches_many(numpy.array(['abc', 'xyz']))
+		self.assertEqual(mask.tolist(), [True, False])
+
+	def test_combined_matchers_should_match_arrays(self):
+		mask = (Not(any_of([2])) & any_float).matches_many(numpy.array([1.0, 2.0, 3.0]))
+		self.assertEqual(mask.tolist(), [True, False, True])
+		self.assertEqual((any_of([2]) | any_of([3])).first_mismatch(numpy.array([2, 3, 4])), 2)
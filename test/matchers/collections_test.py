@@ -31,3 +31,50 @@ class CollectionsTest(TestCase):
 		self.assertTrue(dict_containing(x=Any(int)).matches({'x':1}))
 		self.assertTrue(dict_containing(x=Any(int)).matches({'x':3}))
 		self.assertFalse(dict_containing(x=Any(int)).matches({'x':'three'}))
+
+	def test_should_match_lists_and_tuples_containing_multiple_items(self):
+		self.assertTrue(object_containing(1, 2, 3).matches(list(range(1000))))
+		self.assertTrue(object_containing(3, 1).matches((1, 2, 3)))
+		self.assertFalse(object_containing(1, 2, 1000).matches(list(range(1000))))
+		self.assertTrue(object_containing(1.0, True).matches([1]))
+
+	def test_should_match_collections_of_unhashable_items(self):
+		self.assertTrue(object_containing([1], 2).matches([2, [1]]))
+		self.assertFalse(object_containing([1], 2).matches([2, [3]]))
+		self.assertTrue(object_containing(1, 2).matches([[1], 1, {}, 2]))
+		self.assertFalse(object_containing(1, 3).matches([[1], 1, {}, 2]))
+
+	def test_should_match_substrings_of_a_string(self):
+		self.assertTrue(object_containing('ab', 'd').matches('abcd'))
+		self.assertFalse(object_containing('ab', 'e').matches('abcd'))
+
+	def test_should_match_an_item_from_a_list(self):
+		self.assertTrue(any_of([1, 2, 3]).matches(3))
+		self.assertTrue(any_of((1, 2, 3)).matches(3.0))
+		self.assertFalse(any_of([1, 2, 3]).matches(4))
+		self.assertFalse(any_of([1, 2, 3]).matches([1]))
+		self.assertTrue(any_of([[1], 2]).matches([1]))
+		self.assertEqual(any_of([1, 2]).desc(), "an item from the collection: [1, 2]")
+
+	def test_should_match_items_changed_in_a_list_after_creation(self):
+		allowed = [1, 2]
+		matcher = any_of(allowed)
+		self.assertFalse(matcher.matches(3))
+		allowed.append(3)
+		self.assertTrue(matcher.matches(3))
+		self.assertEqual(matcher.matches_many([3, 4]), [True, False])
+		allowed[0] = 5
+		self.assertFalse(matcher.matches(1))
+		self.assertTrue(matcher.matches(5))
+		self.assertEqual(matcher.matches_many([1, 5]), [False, True])
+		allowed.append([4])
+		self.assertTrue(matcher.matches([4]))
+		allowed.remove(2)
+		self.assertFalse(matcher.matches(2))
+
+	def test_should_match_many_items_from_a_list(self):
+		self.assertEqual(any_of([1, 2, 3]).matches_many([3, 4, 1.0]), [True, False, True])
+		self.assertEqual(any_of([1, 2, 3]).matches_many([3, [1], 1]), [True, False, True])
+		self.assertEqual(any_of([[1], 2]).matches_many([[1], 2, 3]), [True, True, False])
+		self.assertEqual(any_of(Collection([1])).matches_many([1, 2]), [True, False])
+		self.assertEqual(any_of([1, 2]).first_mismatch([1, 2, 3]), 2)
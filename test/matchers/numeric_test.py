@@ -0,0 +1,103 @@
+from unittest import TestCase, skipIf
+
+from mocktest.matchers import *
+try:
+	import numpy
+except ImportError:
+	numpy = None
+
+class NumericTest(TestCase):
+	def test_should_match_approximately_equal_numbers(self):
+		self.assertTrue(approx(1.0).matches(1.0000001))
+		self.assertTrue(approx(1).matches(1))
+		self.assertFalse(approx(1.0).matches(1.1))
+		self.assertTrue(approx(1.0, rel=0.2).matches(1.1))
+		self.assertTrue(approx(0, abs=0.5).matches(-0.4))
+		self.assertFalse(approx(1.0).matches('1.0'))
+		self.assertFalse(approx(1.0).matches([1.0]))
+		self.assertFalse(approx(float('nan')).matches(float('nan')))
+		self.assertTrue(approx(float('inf')).matches(float('inf')))
+		self.assertEqual(approx(1.0).desc(), "approximately 1.0 (rel=1e-06, abs=1e-12)")
+
+	def test_should_match_approximately_equal_sequences(self):
+		self.assertTrue(approx([1.0, 2.0]).matches((1.0000001, 2)))
+		self.assertFalse(approx([1.0, 2.0]).matches([1.0, 2.1]))
+		self.assertFalse(approx([1.0, 2.0]).matches([1.0]))
+		self.assertFalse(approx([1.0, 2.0]).matches(1.0))
+
+	def test_should_describe_approximate_mismatches(self):
+		self.assertEqual(approx(1.0).describe_mismatch(1.5), "differs by 0.5 (tolerance 1e-06)")
+		self.assertEqual(approx([1, 2, 3]).describe_mismatch([1, 2.5, 5]),
+			"2 of 3 elements don't match, first at index 1 (2.5 != 2), max deviation 2")
+		self.assertEqual(approx([1, 2]).describe_mismatch([1]), "shape (1,) differs from expected (2,)")
+		self.assertEqual(approx(1).describe_mismatch('a'), None)
+
+	def test_should_match_numbers_in_range(self):
+		self.assertTrue(in_range(0, 10).matches(0))
+		self.assertTrue(in_range(0, 10).matches(10))
+		self.assertFalse(in_range(0, 10).matches(10.5))
+		self.assertFalse(in_range(0, 10).matches('5'))
+		self.assertTrue(in_range(None, 10).matches(-100))
+		self.assertTrue(in_range(0, None).matches(100))
+		self.assertTrue(in_range(0, 10).matches([1, 2, 3]))
+		self.assertFalse(in_range(0, 10).matches([1, 20, 3]))
+		self.assertEqual(in_range(0, 10).matches_many([1, 20, [3]]), [True, False, True])
+		self.assertEqual(in_range(0, 10).desc(), "a number between 0 and 10")
+		self.assertEqual(in_range(None, 10).desc(), "a number at most 10")
+		self.assertEqual(in_range(0, None).desc(), "a number at least 0")
+
+	def test_should_describe_range_mismatches(self):
+		self.assertEqual(in_range(0, 10).describe_mismatch(12), "outside the range by 2")
+		self.assertEqual(in_range(0, 10).describe_mismatch([1, 12, -5]),
+			"2 of 3 elements don't match, first at index 1 (12), max deviation 5")
+		self.assertEqual(in_range(0, 10).describe_mismatch([1, 2]), None)
+
+	def test_should_match_equal_sequences(self):
+		self.assertTrue(array_equal([1, 2, 3]).matches((1, 2, 3)))
+		self.assertFalse(array_equal([1, 2, 3]).matches([1, 2, 4]))
+		self.assertFalse(array_equal([1, 2, 3]).matches([1, 2]))
+		self.assertFalse(array_equal([1]).matches(1))
+		self.assertEqual(array_equal([1, 2, 3]).describe_mismatch([1, 5, 4]),
+			"2 of 3 elements don't match, first at index 1 (5 != 2)")
+		self.assertEqual(array_equal([1, 2, 3]).describe_mismatch([1]), "length 1 differs from expected 3")
+
+@skipIf(numpy is None, "numpy is not installed")
+class NumpyNumericTest(TestCase):
+	def setUp(self):
+		self.expected = numpy.linspace(1, 2, 1000)
+		self.actual = self.expected.copy()
+		self.actual[10] += 0.5
+		self.actual[500] -= 0.1
+
+	def test_should_match_approximately_equal_arrays(self):
+		self.assertTrue(approx(self.expected).matches(self.expected * (1 + 1e-9)))
+		self.assertTrue(approx(self.expected).matches(list(self.expected)))
+		self.assertFalse(approx(self.expected).matches(self.actual))
+		self.assertFalse(approx(self.expected).matches(self.expected[:10]))
+		self.assertFalse(approx(1.0).matches(self.expected))
+		self.assertEqual(approx(self.expected).describe_mismatch(self.actual),
+			"2 of 1000 elements don't match, first at index 10 (%r != %r), max deviation 0.5"
+			% (self.actual[10].item(), self.expected[10].item()))
+
+	def test_should_match_many_numbers_at_once(self):
+		mask = approx(1.5).matches_many(numpy.array([1.5, 1.6, 1.5000001]))
+		self.assertTrue(isinstance(mask, numpy.ndarray))
+		self.assertEqual(mask.tolist(), [True, False, True])
+		self.assertEqual(in_range(0, 1).matches_many(numpy.array([0, 2, 1])).tolist(), [True, False, True])
+		self.assertEqual(in_range(0, 1).first_mismatch(numpy.array([0, 1, 2])), 2)
+
+	def test_should_match_arrays_in_range(self):
+		array = numpy.arange(6).reshape(2, 3)
+		self.assertTrue(in_range(0, 5).matches(array))
+		self.assertFalse(in_range(0, 4).matches(array))
+		self.assertEqual(in_range(1, 4).describe_mismatch(array),
+			"2 of 6 elements don't match, first at index (0, 0) (0), max deviation 1.0")
+
+	def test_should_match_equal_arrays(self):
+		array = numpy.arange(6).reshape(2, 3)
+		self.assertTrue(array_equal(array).matches(array.copy()))
+		self.assertTrue(array_equal([[0, 1, 2], [3, 4, 5]]).matches(array))
+		self.assertFalse(array_equal(array).matches(array.ravel()))
+		self.assertEqual(array_equal(array).describe_mismatch(array.ravel()), "shape (6,) differs from expected (2, 3)")
+		self.assertEqual(array_equal(array).describe_mismatch(array * 2),
+			"5 of 6 elements don't match, first at index (0, 1) (2 != 1), max deviation 5.0")
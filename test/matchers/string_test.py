@@ -13,3 +13,47 @@ class TypeMatcherTest(TestCase):
 		self.assertTrue(string_containing('dfd').matches('fdfds'))
 		self.assertFalse(string_containing('f').matches('x'))
 
+	def test_should_share_compiled_regexes(self):
+		self.assertTrue(string_matching('^shared').regex is string_matching('^shared').regex)
+
+	def test_should_match_any_of_several_regexes(self):
+		matcher = string_matching_any('^f', 'b+ar', re.compile('baz', re.I))
+		self.assertTrue(matcher.matches('foo'))
+		self.assertTrue(matcher.matches('bbar'))
+		self.assertTrue(matcher.matches('BAZ'))
+		self.assertFalse(matcher.matches('xfoo'))
+		self.assertEqual(matcher.matching_pattern('bar'), 'b+ar')
+		self.assertEqual(matcher.matching_pattern('x'), None)
+		self.assertEqual(matcher.desc(), "a string matching any of: ^f, b+ar, %s" % (re.compile('baz', re.I),))
+
+	def test_should_combine_regexes_into_a_single_pattern(self):
+		matcher = string_matching_any('a+', 'b', 'c$')
+		self.assertTrue(matcher._combined is not None)
+		self.assertEqual([matcher.matching_pattern(s) for s in ('aa', 'bx', 'c', 'cx')], ['a+', 'b', 'c$', None])
+
+	def test_should_match_any_of_several_bytes_regexes(self):
+		matcher = string_matching_any(re.compile(b'foo'), re.compile(b'ba+r'))
+		self.assertTrue(matcher.matches(b'foo'))
+		self.assertTrue(matcher.matches(b'baar'))
+		self.assertFalse(matcher.matches(b'baz'))
+
+	def test_should_match_any_of_several_regexes_with_groups(self):
+		matcher = string_matching_any(r'(a)\1', r'(b)\1')
+		self.assertTrue(matcher._combined is None)
+		self.assertTrue(matcher.matches('bb'))
+		self.assertFalse(matcher.matches('ab'))
+		self.assertEqual(matcher.matching_pattern('bb'), r'(b)\1')
+
+	def test_should_match_any_of_several_substrings(self):
+		matcher = string_containing_any('error', 'warn', 'warning', 'a.b')
+		self.assertTrue(matcher.matches('a warning!'))
+		self.assertTrue(matcher.matches('xa.bx'))
+		self.assertFalse(matcher.matches('axb'))
+		self.assertFalse(matcher.matches(None))
+		self.assertEqual(matcher.matching_substring('a warning, then an error'), 'warning')
+		self.assertEqual(matcher.matching_substring('fine'), None)
+		self.assertEqual(matcher.desc(), "a string containing any of: error, warn, warning, a.b")
+
+	def test_should_match_substrings_of_many_strings(self):
+		self.assertEqual(string_containing('b').matches_many(['abc', 'xyz', None, 'b']), [True, False, False, True])
+		self.assertEqual(string_containing('b').first_mismatch(['abc', 'xyz']), 1)
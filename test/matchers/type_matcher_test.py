@@ -37,6 +37,13 @@ class TypeMatcherTest(TestCase):
 				pass
 		self.assertTrue(object_with('foo').matches(ClassWith_foo()))
 		self.assertFalse(object_with('not_foo').matches(ClassWith_foo()))
+
+	def test_should_match_many_objects(self):
+		self.assertEqual(any_int.matches_many([1, 'a', 2.0, 3]), [True, False, False, True])
+		self.assertEqual(any_int.first_mismatch([1, 'a', 2.0, 3]), 1)
+		self.assertEqual(any_int.first_mismatch(iter([1, 2])), None)
+		self.assertEqual(object_with('real').matches_many([1, 'a']), [True, False])
+		self.assertEqual(object_with('real').first_mismatch([1, 'a']), 1)
 	
 	
 	
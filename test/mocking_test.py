@@ -2,7 +2,7 @@ from __future__ import print_function
 from mocktest import *
 from mocktest.transaction import MockTransaction
 from mocktest.mockerror import MockError
-from unittest import TestCase
+from unittest import TestCase, skipIf
 import unittest
 from functools import wraps
 import os
@@ -16,6 +16,10 @@ except ImportError:
 	# py2
 	from StringIO import StringIO
 	import __builtin__ as builtins
+try:
+	import numpy
+except ImportError:
+	numpy = None
 
 def _dir(obj):
 	return [x for x in dir(obj) if not x.startswith('_')]
@@ -75,6 +79,30 @@ class TestMockingCalls(TestCase):
 			self.assertTrue("Stubbed method 'meth' ran out of return values." in str(e))
 			self.assertTrue("Received 4 calls with arguments:\n" in str(e))
 	
+	@passing
+	def test_return_values_from_an_iterable(self):
+		consumed = []
+		def values():
+			for i in range(3):
+				consumed.append(i)
+				yield i
+		when(obj).meth.then_return_from(values())
+		assert obj.meth() == 0
+		assert consumed == [0]
+		assert obj.meth() == 1
+		assert obj.meth() == 2
+		try:
+			obj.meth()
+			self.fail()
+		except AssertionError as e:
+			self.assertTrue("Stubbed method 'meth' ran out of return values." in str(e))
+
+	@passing
+	def test_many_return_values(self):
+		when(obj).meth.then_return(*range(20000))
+		for i in range(20000):
+			assert obj.meth() == i
+
 	def test_should_revert_all_replaced_attrs(self):
 		self.assertEquals(_dir(obj), [])
 		with MockTransaction:
@@ -153,6 +181,40 @@ class TestMockingCalls(TestCase):
 		self.assertRaises(KeyError, lambda: obj['grand'])
 		self.assertRaises(KeyError, lambda: obj['child'])
 
+	@passing
+	def test_replacing_many_items(self):
+		obj = dict(('key_%d' % i, i) for i in range(100))
+		original = dict(obj)
+		core._teardown()
+		core._setup()
+		teardown_count = len(MockTransaction.teardown_actions)
+
+		modify(obj).update(dict(('key_%d' % i, -i) for i in range(50, 150)), extra='created')
+		for i in range(50):
+			modify(obj)['key_%d' % i] = 'replaced'
+		modify(obj)['key_0'] = 'replaced again'
+		assert obj['key_0'] == 'replaced again'
+		assert obj['key_99'] == -99
+		assert obj['key_149'] == -149
+		assert obj['extra'] == 'created'
+		self.assertEquals(len(MockTransaction.teardown_actions), teardown_count + 1)
+
+		core._teardown()
+		core._setup()
+		self.assertEquals(obj, original)
+
+	@passing
+	def test_replacing_items_in_nested_transaction(self):
+		obj = {'key': 'original'}
+		modify(obj)['key'] = 'outer'
+		with MockTransaction:
+			modify(obj).update(key='inner', other='inner')
+			assert obj == {'key': 'inner', 'other': 'inner'}
+		self.assertEquals(obj, {'key': 'outer'})
+		core._teardown()
+		core._setup()
+		self.assertEquals(obj, {'key': 'original'})
+
 
 class TestMockingSpecialMethods(TestCase):
 	@passing
@@ -209,6 +271,43 @@ class TestMockingBuiltins(TestCase):
 		# just check this doesn't cause infinite recursion
 		f = inspect.currentframe()
 		inspect.getframeinfo(f)
+
+	@passing
+	def test_mocking_inspect_getframeinfo_with_full_stack_capture(self):
+		orig = inspect.getframeinfo
+		when(inspect).getframeinfo.with_stack(full_stack).then_call(orig)
+		inspect.getframeinfo(inspect.currentframe())
+		# the nested call is recorded first, as it completes first
+		inner, outer = inspect.getframeinfo.received_calls
+		assert outer._call_site is not None
+		assert inner._call_site is None
+
+	def test_stack_capture_does_not_walk_the_whole_stack(self):
+		from mocktest.callrecord import _capture_state
+		def nested(depth):
+			if depth == 0:
+				return Call((), {}, stack=True)
+			return nested(depth - 1)
+		walked = []
+		def walking(name):
+			def fn(*a, **k):
+				walked.append(name)
+				raise AssertionError("%s called while capturing a call site" % (name,))
+			return fn
+		originals = dict((name, getattr(inspect, name)) for name in ('stack', 'getouterframes', 'getframeinfo'))
+		try:
+			for name in originals:
+				setattr(inspect, name, walking(name))
+			call = nested(50)
+		finally:
+			for name, fn in originals.items():
+				setattr(inspect, name, fn)
+		self.assertEquals(walked, [])
+		# only the frame that invoked the mock is kept
+		code, lineno = call._call_site
+		self.assertEquals(code.co_name, 'nested')
+		# the guard state is per-thread, and is reset after each capture
+		assert not _capture_state.active
 	
 class TestExpectations(TestCase):
 	@passing
@@ -251,6 +350,168 @@ class TestExpectations(TestCase):
 		obj.meth()
 		obj.meth()
 	
+	@passing
+	def test_expectations_count_calls_handled_by_other_acts(self):
+		expect(obj).meth(Any).twice()
+		when(obj).meth(1).then_return('one')
+		assert obj.meth(1) == 'one'
+		assert obj.meth(2) == None
+
+	@failing
+	def test_expectations_count_calls_handled_by_other_exact_acts(self):
+		expect(obj).meth(1).once()
+		when(obj).meth(1).then_return('one')
+		obj.meth(1)
+		obj.meth(1)
+
+	@passing
+	def test_expectations_added_after_calls_count_earlier_calls(self):
+		when(obj).meth.then_return(None)
+		obj.meth(1)
+		obj.meth(2)
+		expect(obj).meth(1).once()
+		expect(obj).meth.twice()
+
+	def test_verification_does_not_replay_calls(self):
+		checked = []
+		def condition(*a):
+			checked.append(a)
+			return True
+		with MockTransaction:
+			expect(obj).meth.where(condition).exactly(3).times()
+			for i in range(3):
+				obj.meth(i)
+			self.assertEquals(len(checked), 3)
+		self.assertEquals(len(checked), 3)
+
+	def test_fail_fast_raises_at_the_offending_call(self):
+		calls = []
+		errors = []
+		def runaway_loop():
+			while True:
+				calls.append(obj.retry())
+		def run():
+			with MockTransaction:
+				expect(obj).retry.at_most(3).times().fail_fast()
+				try:
+					runaway_loop()
+				except AssertionError as e:
+					errors.append(str(e))
+		# the expectation is still reported at the end of the transaction
+		self.assertRaises(AssertionError, run)
+		self.assertEquals(_dir(obj), [])
+		self.assertEquals(len(calls), 3)
+		message, = errors
+		self.assertTrue("expected at most 3 calls" in message, message)
+		self.assertTrue("The call exceeding this expectation was: ()" in message, message)
+		self.assertTrue("calls.append(obj.retry())" in message, message)
+
+	def test_fail_fast_on_transaction(self):
+		errors = []
+		def run():
+			with MockTransaction:
+				MockTransaction.fail_fast = True
+				expect(obj).meth(1).once()
+				expect(obj).meth(2).exactly(2).times().fail_fast(False)
+				obj.meth(1)
+				obj.meth(2)
+				obj.meth(2)
+				obj.meth(2)
+				try:
+					obj.meth(1)
+				except AssertionError as e:
+					errors.append(e)
+		self.assertRaises(AssertionError, run)
+		self.assertEquals(len(errors), 1)
+		self.assertEquals(_dir(obj), [])
+
+	@passing
+	def test_unexpected_call_messages_are_built_lazily(self):
+		described = []
+		class Arg(object):
+			def __repr__(self):
+				described.append(self)
+				return 'Arg()'
+		when(obj).meth(1).then_return(1)
+		try:
+			obj.meth(Arg())
+		except TypeError as e:
+			self.assertEquals(described, [])
+			message = str(e)
+			self.assertEquals(len(described), 1)
+			self.assertEquals(message,
+				"stubbed method 'meth' received unexpected arguments: (Arg())\n"
+				"Allowable argument conditions are:\n"
+				"   - arguments equal to: (1)")
+			str(e)
+			self.assertEquals(len(described), 1)
+		else:
+			self.fail()
+
+	@passing
+	def test_unexpected_call_errors_have_string_args_and_can_be_pickled(self):
+		import pickle
+		when(obj).meth(1).then_return(1)
+		try:
+			obj.meth(2)
+		except TypeError as e:
+			error = pickle.loads(pickle.dumps(e))
+			self.assertTrue(isinstance(e.args[0], str))
+			self.assertEquals(error.args, e.args)
+			self.assertEquals(str(error), str(e))
+			assert str(e).startswith("stubbed method 'meth' received unexpected arguments: (2)"), str(e)
+		else:
+			self.fail()
+		self.assertRaises(TypeError, lambda: obj.meth(2),
+			args=("stubbed method 'meth' received unexpected arguments: (2)\n"
+				"Allowable argument conditions are:\n"
+				"   - arguments equal to: (1)",))
+
+	def test_reality_reports_are_bounded(self):
+		act = MockAct('meth').exactly(3)
+		calls = [Call.like(i % 4, 'x' * 1000) for i in range(50000)]
+		message = act.summary(False, calls)
+		lines = message.splitlines()
+		self.assertTrue(len(lines) < 40, message)
+		self.assertTrue("received 50000 calls with arguments:" in message, message)
+		self.assertTrue("  ... (49980 calls not shown)" in lines, message)
+		self.assertTrue("  distinct arguments (4):" in lines, message)
+		self.assertTrue(all(len(line) < 250 for line in lines), message)
+
+	def test_reality_reports_group_calls_by_frequency(self):
+		act = MockAct('meth').exactly(3)
+		calls = [Call.like('rare')] + [Call.like('common')] * 30 + [Call.like('less common')] * 10
+		lines = act.describe_reality(calls).splitlines()
+		index = lines.index("  distinct arguments (3):")
+		self.assertEquals(lines[index+1:], [
+			"    30 x ('common')",
+			"    10 x ('less common')",
+			"    1 x ('rare')",
+		])
+
+	@passing
+	def test_full_reality_reports(self):
+		modify(MockTransaction).full_reports = True
+		act = MockAct('meth').exactly(3)
+		lines = act.describe_reality([Call.like(i) for i in range(100)]).splitlines()
+		self.assertEquals(len(lines), 101)
+
+	@passing
+	def test_reality_reports_written_to_disk(self):
+		import tempfile, shutil
+		report_dir = tempfile.mkdtemp()
+		try:
+			modify(MockTransaction).report_dir = report_dir
+			act = MockAct('my.meth').exactly(3)
+			desc = act.describe_reality([Call.like(i) for i in range(100)])
+			path = desc.splitlines()[-1].split("full list of calls: ")[1]
+			self.assertEquals(os.path.dirname(path), report_dir)
+			assert os.path.basename(path).startswith('mocktest-my_meth-'), path
+			with open(path) as f:
+				self.assertEquals(len(f.read().splitlines()), 100)
+		finally:
+			shutil.rmtree(report_dir)
+
 class TestMatchers(TestCase):
 	@passing
 	def test_any_single_arg(self):
@@ -341,15 +602,64 @@ class TestMatchers(TestCase):
 		self.assertRaises(TypeError, lambda: obj.foo())
 		self.assertRaises(TypeError, lambda: obj.foo(int))
 
-	##TODO: this should work in py3k?
-	#@passing
-	#def test_splat_in_amongst_normal_matchers(self):
-	#	when(obj).foo(1, 2, *Any(int), 3, 4, 5).then_return(True)
-	#	assert obj.foo(1,2,3,4,5)
-	#	assert obj.foo(1,2,0,0,0,3,4,5)
-	#	self.assertRaises(TypeError, lambda: obj.foo(1,2,3,4,4,5))
-	#	self.assertRaises(TypeError, lambda: obj.foo())
-	#	self.assertRaises(TypeError, lambda: obj.foo(int))
+	@passing
+	def test_splat_in_amongst_normal_matchers(self):
+		when(obj).foo(*((1, 2) + tuple(Any(int)) + (3, 4, 5))).then_return(True)
+		assert obj.foo(1,2,3,4,5)
+		assert obj.foo(1,2,0,0,0,3,4,5)
+		self.assertRaises(TypeError, lambda: obj.foo(1,2,3,4,4,5))
+		self.assertRaises(TypeError, lambda: obj.foo())
+		self.assertRaises(TypeError, lambda: obj.foo(int))
+
+	@passing
+	def test_trailing_args_after_splat(self):
+		when(obj).foo(*any_args, **{}).then_return('any')
+		when(obj).foo(*((Any(str),) + tuple(args_containing(1)) + ('end',))).then_return('trailing')
+		assert obj.foo('s', 1, 'end') == 'trailing'
+		assert obj.foo('s', 2, 1, 3, 'end') == 'trailing'
+		assert obj.foo('s', 2, 'end') == 'any'
+		assert obj.foo('s', 1) == 'any'
+
+	@passing
+	def test_multiple_splats_are_rejected(self):
+		self.assertRaises(MockError, lambda: when(obj).foo(*(list(any_args) + list(any_args))))
+
+	@passing
+	def test_matching_explicit_kwargs_with_matchers_and_wildcard(self):
+		when(obj).foo(x=Any(int), y=2, **kwargs_containing(z=3)).then_return(True)
+		assert obj.foo(x=1, y=2, z=3)
+		assert obj.foo(x=1, y=2, z=3, w=4)
+		self.assertRaises(TypeError, lambda: obj.foo(x='1', y=2, z=3))
+		self.assertRaises(TypeError, lambda: obj.foo(y=2, z=3))
+		self.assertRaises(TypeError, lambda: obj.foo(x=1, y=2))
+
+	@skipIf(numpy is None, "numpy is not installed")
+	@passing
+	def test_matching_array_arguments_by_equality(self):
+		when(obj).foo(numpy.arange(3)).then_return(1)
+		when(obj).foo(numpy.arange(3), y=numpy.ones(2)).then_return(2)
+		when(obj).foo(numpy.arange(4), Any).then_return(3)
+		assert obj.foo(numpy.arange(3)) == 1
+		assert obj.foo(numpy.arange(3), y=numpy.ones(2)) == 2
+		assert obj.foo(numpy.arange(4), 'x') == 3
+		self.assertRaises(TypeError, lambda: obj.foo(numpy.arange(3) + 1))
+		self.assertRaises(TypeError, lambda: obj.foo(numpy.arange(3), y=numpy.zeros(2)))
+
+	@skipIf(numpy is None, "numpy is not installed")
+	@passing
+	def test_counting_calls_with_array_arguments(self):
+		expect(obj).foo(numpy.arange(3)).twice()
+		when(obj).foo(Any).then_return(None)
+		obj.foo(numpy.arange(3))
+		obj.foo(numpy.arange(2))
+		obj.foo(numpy.arange(3))
+
+	@passing
+	def test_matching_numbers_approximately(self):
+		when(obj).foo(approx(0.3), in_range(0, 10)).then_return(True)
+		assert obj.foo(0.1 + 0.2, 5)
+		self.assertRaises(TypeError, lambda: obj.foo(0.31, 5))
+		self.assertRaises(TypeError, lambda: obj.foo(0.3, 11))
 
 class TestMockCreation(TestCase):
 	@passing
@@ -364,7 +674,16 @@ class TestMockCreation(TestCase):
 		obj = mock('foo').with_children(x=1, y=2)
 		assert obj.x == 1
 		assert obj.y == 2
-		
+
+	@passing
+	def test_children_may_share_names_with_private_attributes(self):
+		obj = mock('foo').with_children(_tree=1, _calls=2, _name=3, _children=4)
+		self.assertEquals((obj._tree, obj._calls, obj._name, obj._children), (1, 2, 3, 4))
+		self.assertEquals(str(obj), 'foo')
+		self.assertEquals(str(obj.bar), 'bar')
+		obj(1)
+		self.assertEquals(obj.received_calls, [Call.like(1)])
+
 	@passing
 	def test_modification_methods_kwargs(self):
 		obj = mock('foo')
@@ -380,6 +699,99 @@ class TestMockCreation(TestCase):
 		assert obj.x == 1
 		assert obj.y == 2
 	
+	@passing
+	def test_mock_nodes_allocate_children_and_calls_on_demand(self):
+		obj = mock('foo')
+		self.assertRaises(AttributeError, lambda: object.__getattribute__(obj, '__dict__'))
+		assert obj._mock_children is None and obj._mock_calls is None
+		child = obj.a
+		assert obj.a is child
+		assert obj._mock_children is None
+		assert obj.b is not child
+		assert obj._mock_children is not None
+		assert child._mock_calls is None
+		child(1)
+		self.assertEquals(child.received_calls, [Call.like(1)])
+		self.assertEquals(obj.b.received_calls, [])
+
+	@passing
+	def test_mock_children_can_be_replaced_and_reverted(self):
+		obj = mock('foo', False)
+		with MockTransaction:
+			modify(obj).children(x=1, y=2)
+			assert obj.x == 1
+			assert obj.y == 2
+			assert 'x' in dir(obj) and 'y' in dir(obj)
+		self.assertRaises(AttributeError, lambda: obj.x)
+		self.assertRaises(AttributeError, lambda: obj.y)
+
+	@passing
+	def test_mock_special_methods_can_be_stubbed(self):
+		obj = mock('foo')
+		when(obj).__len__().then_return(3)
+		when(obj).__call__(1).then_return('one')
+		assert len(obj) == 3
+		assert obj(1) == 'one'
+
+	@passing
+	def test_mock_depth_limit(self):
+		obj = mock('foo', max_depth=2)
+		assert obj.a.b is not None
+		try:
+			obj.a.b.c
+		except MockError as e:
+			self.assertEquals(str(e), "Can't create child 'c' of <#RecursiveStub: b>: mock exceeds its maximum depth of 2")
+		else:
+			self.fail("no error raised")
+
+	@passing
+	def test_mock_node_limit(self):
+		obj = mock('foo', max_nodes=3)
+		obj.a
+		obj.b
+		obj.a
+		self.assertRaises(MockError, lambda: obj.c)
+		self.assertRaises(MockError, lambda: obj.a.x)
+
+	@passing
+	def test_mock_limits_do_not_apply_to_explicit_children(self):
+		obj = mock('foo', max_depth=0)
+		when(obj).meth.then_return(1)
+		expect(obj).other.once()
+		modify(obj).attr = 2
+		self.assertEquals(obj.meth(), 1)
+		obj.other()
+		self.assertEquals(obj.attr, 2)
+		self.assertRaises(MockError, lambda: obj.unknown)
+
+	@passing
+	def test_default_mock_limits(self):
+		modify(MockTransaction).mock_max_nodes = 10
+		obj = mock('foo')
+		self.assertRaises(MockError, lambda: [getattr(obj, 'child_%d' % i) for i in range(20)])
+		self.assertEquals(mock_stats(obj).nodes, 10)
+
+	@passing
+	def test_mock_stats(self):
+		obj = mock('foo')
+		obj.small()
+		for i in range(3):
+			getattr(obj.big, 'child_%d' % i)(i)
+		expect(obj.big).method().twice()
+		obj.big.method()
+		obj.big.method()
+
+		stats = mock_stats(obj)
+		self.assertEquals(stats.nodes, 6)
+		self.assertEquals(stats.calls, 6)
+		self.assertEquals([(child.name, child.nodes, child.calls) for child in stats.children],
+			[('big', 4, 5), ('small', 1, 1)])
+		assert stats.bytes > sum(child.bytes for child in stats.children) > 0
+		lines = stats.desc(limit=1).splitlines()
+		self.assertEquals(lines[0], "foo: 6 nodes, 6 calls, ~%s bytes" % (stats.bytes,))
+		self.assertEquals(lines[1], "  big: 4 nodes, 5 calls, ~%s bytes" % (stats.children[0].bytes,))
+		self.assertEquals(lines[-1], "  ... (1 more children, 1 nodes)")
+
 	@passing
 	def test_creation_copying_existing_object(self):
 		class Base(object):
@@ -407,6 +819,60 @@ class TestMockCreation(TestCase):
 		assert obj.foo(1) == 'one'
 		assert obj.foo(2) == 'anything'
 
+	@passing
+	def test_exact_argument_acts_follow_most_recent_precedence(self):
+		when(obj).get(1).then_return('first one')
+		when(obj).get(Any).then_return('anything')
+		when(obj).get(2).then_return('two')
+		when(obj).get(1, x='y').then_return('one with kwargs')
+		assert obj.get(1) == 'anything'
+		assert obj.get(2) == 'two'
+		assert obj.get(3) == 'anything'
+		assert obj.get(1, x='y') == 'one with kwargs'
+		when(obj).get(1).then_return('one')
+		assert obj.get(1) == 'one'
+		assert obj.get(True) == 'one'
+
+	@passing
+	def test_many_exact_argument_acts(self):
+		for i in range(500):
+			when(obj).get(i).then_return(str(i))
+		when(obj).get(('a', 'b')).then_return('tuple')
+		assert obj.get(0) == '0'
+		assert obj.get(499) == '499'
+		assert obj.get(('a', 'b')) == 'tuple'
+		self.assertRaises(TypeError, lambda: obj.get(500))
+
+	@passing
+	def test_exact_argument_acts_compare_against_non_literal_arguments(self):
+		class EqualToEverything(object):
+			def __eq__(self, other): return True
+			def __hash__(self): return 0
+		when(obj).get(1).then_return('one')
+		assert obj.get(EqualToEverything()) == 'one'
+
+	def test_batch_argument_matching_agrees_with_matching_each_call(self):
+		from mocktest.mocking import MockAct
+		nan = float('nan')
+		class Skipping(Matcher):
+			_cost = 10
+			def matches(self, other): return other != 'skip'
+		class Exploding(Matcher):
+			_cost = 0
+			def matches(self, other):
+				if other == 'boom':
+					raise RuntimeError(other)
+				return True
+		cases = [
+			((nan,), [Call.like(nan), Call.like(float('nan'))]),
+			((nan, any_int), [Call.like(nan, 1), Call.like(float('nan'), 1), Call.like(nan, 'a')]),
+			# matchers are checked in positional order (not by cost), so the exploding one isn't reached
+			((Skipping(), Exploding()), [Call.like('skip', 'boom'), Call.like(1, 2)]),
+		]
+		for args, calls in cases:
+			act = MockAct('meth')(*args)
+			self.assertEquals(act._matches_many(calls), [act._matches(call) for call in calls])
+
 class CallInspection(TestCase):
 	@passing
 	def test_inspect_calls(self):
@@ -419,6 +885,99 @@ class CallInspection(TestCase):
 		self.assertEquals(obj.b.received_calls, [Call.like(1,2,3)])
 		self.assertEquals(obj.c.received_calls, [((1,2,3), {'x':1})])
 
+	@passing
+	def test_querying_stubbed_calls(self):
+		when(obj).get.then_return(None)
+		for i in range(1000):
+			obj.get(i % 3)
+		obj.get('key', default=None)
+		self.assertEquals(obj.get.count_of(0), 334)
+		self.assertEquals(obj.get.count_of('key', default=None), 1)
+		self.assertEquals(obj.get.count_where(Any(int)), 1000)
+		self.assertEquals(len(obj.get.histogram()), 4)
+		self.assertEquals(obj.get.calls_where(Any(str), **any_kwargs), [Call.like('key', default=None)])
+
+	@passing
+	def test_querying_mock_calls(self):
+		m = mock('m')
+		m.a(1)
+		m.a(1)
+		self.assertEquals(m.a.received_calls.count_of(1), 2)
+
+	@passing
+	def test_call_site_source_is_only_read_when_described(self):
+		obj = mock('foo')
+		obj.a(1)
+		call, = obj.a.received_calls
+		assert call._call_frameinfo is None
+		desc = str(call)
+		assert 'mocking_test.py' in desc, desc
+		assert 'obj.a(1)' in desc, desc
+
+	@passing
+	def test_bounded_call_history(self):
+		expect(obj).meth(1).exactly(3).times().with_call_history(keep_calls(first=1, last=1))
+		when(obj).meth(2).then_return(2)
+		obj.meth(1)
+		obj.meth(2)
+		obj.meth(1)
+		obj.meth(1)
+		self.assertEquals(obj.meth.received_calls, [Call.like(1), Call.like(1)])
+		self.assertEquals(obj.meth.received_calls.total, 4)
+
+	@passing
+	def test_bounded_call_history_descriptions(self):
+		modify(MockTransaction).call_history = keep_calls(first=1, last=1, index=True)
+		expect(obj).meth(1).at_least(1).times()
+		for i in range(5):
+			obj.meth(1); call_line = inspect.currentframe().f_lineno
+		act, = obj.meth._acts
+		lines = act.describe_reality(obj.meth.received_calls).splitlines()
+		self.assertEquals(len(lines), 6)
+		self.assertEquals(lines[0], "5 calls with arguments:")
+		assert lines[1].startswith("  1:   (1) "), lines[1]
+		self.assertEquals(lines[2], "  ... (3 calls not shown)")
+		assert lines[3].startswith("  5:   (1) "), lines[3]
+		self.assertEquals(lines[4], "  distinct arguments (1):")
+		assert lines[5].startswith("    5 x (1)  "), lines[5]
+		assert lines[5].endswith(" // mocking_test.py:%s" % (call_line,)), lines[5]
+
+	@passing
+	def test_count_only_history_on_mocks(self):
+		modify(MockTransaction).call_history = count_calls_only
+		m = mock('m')
+		m.a(1)
+		m.a(2)
+		self.assertEquals(m.a.received_calls.total, 2)
+		self.assertEquals(list(m.a.received_calls), [])
+
+	@passing
+	def test_stack_capture_can_be_disabled_per_stub(self):
+		when(obj).meth.with_stack(no_stack).then_return(1)
+		obj.meth()
+		call, = obj.meth.received_calls
+		assert call._call_site is None
+		self.assertEquals(str(call), '()')
+
+	def test_stack_capture_policy_on_transaction(self):
+		with MockTransaction:
+			MockTransaction.stack_capture = sampled_stack(3)
+			when(obj).meth.then_return(1)
+			for i in range(7):
+				obj.meth()
+			self.assertEquals(
+				[call._call_site is not None for call in obj.meth.received_calls],
+				[True, False, False, True, False, False, True])
+		self.assertTrue(MockTransaction.stack_capture is lazy_stack)
+
+	@passing
+	def test_full_stack_capture_reads_source_immediately(self):
+		when(obj).meth.with_stack(full_stack)
+		obj.meth(1)
+		call, = obj.meth.received_calls
+		assert call._call_frameinfo is not None
+		assert 'obj.meth(1)' in str(call), str(call)
+
 class TestSkeletons(TestCase):
 	def test_inheriting_setup_teardown(self):
 		class FirstTestCase(TestCase):
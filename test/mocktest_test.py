@@ -336,6 +336,18 @@ class TestAutoSpecVerification(unittest.TestCase):
 		self.assertTrue(
 			"""AssertionError: expected:\n'boo'\nto be a string matching: ^f\n(message)""" in failure_text,
 			repr(result))
+
+	def test_assert_matches_error_message_should_summarise_mismatches(self):
+		from mocktest.matchers import approx
+		def test_approx_match(s):
+			s.assertMatches(approx([1.0] * 100), [1.0] * 99 + [2.0])
+		result = self.run_method(test_approx_match)
+		self.assertFalse(result.wasSuccessful())
+		failure_text = result.failures[0][1]
+		self.assertTrue(
+			"""but 1 of 100 elements don't match, first at index 99 (2.0 != 1.0), max deviation 1.0""" in failure_text,
+			failure_text)
+		self.assertFalse(repr([1.0] * 99) in failure_text, failure_text)
 	
 	def test_reality_formatting(self):
 		core._teardown()
@@ -0,0 +1,282 @@
+from mocktest import *
+from unittest import TestCase, skipIf
+import sys
+import threading
+import types
+from mocktest.transaction import MockTransaction
+from mocktest.mockerror import MockError
+
+shared = types.ModuleType('shared')
+shared.value = 'original'
+
+class Object(object): pass
+
+class Barrier(object):
+	"""a minimal threading.Barrier, which python 2 lacks"""
+	def __init__(self, parties):
+		self.parties = parties
+		self.arrived = 0
+		self.condition = threading.Condition()
+
+	def wait(self):
+		with self.condition:
+			generation = self.arrived // self.parties
+			self.arrived += 1
+			if self.arrived % self.parties == 0:
+				self.condition.notify_all()
+			while self.arrived // self.parties == generation:
+				self.condition.wait()
+
+# defined via exec, as `async def` is a syntax error on python 2
+ASYNC_TASKS = """
+async def run(i):
+	with MockTransaction:
+		obj = Object()
+		when(obj).meth.then_return(i)
+		await asyncio.sleep(0)
+		assert MockTransaction.started
+		result = obj.meth()
+		await asyncio.sleep(0)
+	return result
+
+async def main():
+	return await asyncio.gather(*[run(i) for i in range(5)])
+"""
+
+class ConcurrentTransactionTest(TestCase):
+	def test_transactions_in_separate_threads_are_independent(self):
+		results = {}
+		errors = []
+		barrier = Barrier(4)
+		def run(i):
+			try:
+				with MockTransaction:
+					MockTransaction.mock_max_nodes = i
+					obj = Object()
+					expect(obj).meth(i).once().and_return(i * 10)
+					barrier.wait()
+					results[i] = (obj.meth(i), MockTransaction.mock_max_nodes)
+					barrier.wait()
+			except Exception as e:
+				errors.append(e)
+		threads = [threading.Thread(target=run, args=(i,)) for i in range(4)]
+		for thread in threads: thread.start()
+		for thread in threads: thread.join()
+		self.assertEqual(errors, [])
+		self.assertEqual(results, {0: (0, 0), 1: (10, 1), 2: (20, 2), 3: (30, 3)})
+		self.assertEqual(MockTransaction.mock_max_nodes, None)
+		self.assertFalse(MockTransaction.started)
+
+	@skipIf(sys.version_info < (3, 7), "requires asyncio.run and contextvars")
+	def test_transactions_in_separate_asyncio_tasks_are_independent(self):
+		import asyncio
+		scope = dict(globals(), asyncio=asyncio)
+		exec(ASYNC_TASKS, scope)
+		self.assertEqual(asyncio.run(scope['main']()), [0, 1, 2, 3, 4])
+		self.assertFalse(MockTransaction.started)
+
+	def test_concurrent_modification_of_shared_objects_is_detected(self):
+		modified = threading.Event()
+		done = threading.Event()
+		errors = []
+		def modify_shared():
+			with MockTransaction:
+				modify(shared).value = 'first'
+				modified.set()
+				done.wait()
+		thread = threading.Thread(target=modify_shared)
+		thread.start()
+		try:
+			modified.wait()
+			with MockTransaction:
+				try:
+					modify(shared).value = 'second'
+				except MockError as e:
+					errors.append(str(e))
+				self.assertRaises(MockError, lambda: when(shared).value.then_return(None))
+				modify(shared).other_value = 'unrelated'
+		finally:
+			done.set()
+			thread.join()
+		self.assertEqual(len(errors), 1)
+		self.assertTrue("already modified by another transaction" in errors[0], errors[0])
+		self.assertEqual(shared.value, 'original')
+		with MockTransaction:
+			modify(shared).value = 'released'
+		self.assertEqual(shared.value, 'original')
+
+class NestedTransactionTest(TestCase):
+	def setUp(self):
+		self.obj = Object()
+		self.obj.attr = 'original'
+
+	def tearDown(self):
+		while MockTransaction.started:
+			MockTransaction.__exit__()
+
+	def test_nested_transaction_rolls_back_only_its_own_changes(self):
+		obj = self.obj
+		with MockTransaction:
+			when(obj).meth.then_return('outer')
+			modify(obj).attr = 'outer'
+			with MockTransaction:
+				when(obj).meth(1).then_return('inner')
+				when(obj).other.then_return('inner')
+				modify(obj).attr = 'inner'
+				self.assertEqual(obj.meth(1), 'inner')
+				self.assertEqual(obj.other(), 'inner')
+				self.assertEqual(obj.attr, 'inner')
+			self.assertEqual(obj.meth(1), 'outer')
+			self.assertFalse(hasattr(obj, 'other'))
+			self.assertEqual(obj.attr, 'outer')
+		self.assertFalse(hasattr(obj, 'meth'))
+		self.assertEqual(obj.attr, 'original')
+		self.assertFalse(MockTransaction.started)
+
+	def test_outer_expectations_are_verified_and_reset_at_each_nested_rollback(self):
+		obj = self.obj
+		MockTransaction.__enter__()
+		expect(obj).meth.once()
+		for i in range(3):
+			with MockTransaction:
+				obj.meth()
+				self.assertEqual(obj.meth.received_calls.total, 1)
+			self.assertEqual(obj.meth.received_calls.total, 0)
+
+		def nested_without_call():
+			with MockTransaction:
+				pass
+		try:
+			nested_without_call()
+		except AssertionError as e:
+			self.assertTrue('Mock "meth" did not match expectations' in str(e), str(e))
+		else:
+			self.fail("no error raised")
+		# outer expectations are not verified again at the outer rollback
+		MockTransaction.__exit__()
+
+	def test_nested_transactions_only_count_calls_made_within_them(self):
+		obj = self.obj
+		with MockTransaction: # e.g. setUpClass
+			when(obj).meth.then_return(None)
+			obj.meth() # warm-up
+			for i in range(2):
+				with MockTransaction:
+					self.assertEqual(obj.meth.received_calls.total, 0)
+					expect(obj).meth.once()
+					obj.meth()
+			self.assertEqual(obj.meth.received_calls.total, 1)
+		self.assertFalse(MockTransaction.started)
+
+	def test_outer_expectations_are_verified_against_calls_made_outside_nested_transactions(self):
+		obj = self.obj
+		MockTransaction.__enter__()
+		expect(obj).meth.once()
+		obj.meth()
+		with MockTransaction:
+			obj.meth()
+		obj.meth()
+		self.assertRaises(AssertionError, MockTransaction.__exit__)
+		self.assertFalse(MockTransaction.started)
+
+	def test_outer_expectations_are_verified_if_called_after_the_last_rollback(self):
+		obj = self.obj
+		MockTransaction.__enter__()
+		expect(obj).meth.once()
+		with MockTransaction:
+			obj.meth()
+		obj.meth()
+		obj.meth()
+		self.assertRaises(AssertionError, MockTransaction.__exit__)
+		self.assertFalse(MockTransaction.started)
+
+	def test_outer_expectations_added_after_the_last_rollback_are_verified(self):
+		obj = self.obj
+		MockTransaction.__enter__()
+		when(obj).meth.then_return(None)
+		with MockTransaction:
+			pass
+		expect(obj).meth.once()
+		self.assertRaises(AssertionError, MockTransaction.__exit__)
+		self.assertFalse(MockTransaction.started)
+
+	def test_expectations_are_only_verified_when_returning_to_their_own_transaction(self):
+		obj = self.obj
+		with MockTransaction: # e.g. a module
+			expect(obj).meth.once()
+			with MockTransaction: # a class
+				with MockTransaction: # a test
+					obj.meth()
+				with MockTransaction: # another test
+					pass
+			def class_without_call():
+				with MockTransaction:
+					with MockTransaction:
+						pass
+			self.assertRaises(AssertionError, class_without_call)
+		self.assertFalse(MockTransaction.started)
+
+	def test_expectations_added_to_outer_stubs_are_verified_and_removed_at_nested_rollback(self):
+		obj = self.obj
+		with MockTransaction:
+			when(obj).meth.then_return('outer')
+			def nested():
+				with MockTransaction:
+					expect(obj).meth(1).then_return('inner')
+			self.assertRaises(AssertionError, nested)
+			self.assertEqual(len(obj.meth._acts), 1)
+			self.assertEqual(obj.meth(1), 'outer')
+
+	def test_nested_transactions_may_modify_objects_claimed_by_enclosing_transactions(self):
+		with MockTransaction:
+			modify(shared).value = 'outer'
+			with MockTransaction:
+				modify(shared).value = 'inner'
+				self.assertEqual(shared.value, 'inner')
+			self.assertEqual(shared.value, 'outer')
+		self.assertEqual(shared.value, 'original')
+
+class StubRegistryTest(TestCase):
+	def test_restubbing_a_method_adds_no_teardown_actions(self):
+		obj = Object()
+		with MockTransaction:
+			when(obj).meth(0).then_return(0)
+			teardown_count = len(MockTransaction.teardown_actions)
+			for i in range(1, 100):
+				when(obj).meth(i).then_return(i)
+			self.assertEqual(len(MockTransaction.teardown_actions), teardown_count)
+			self.assertEqual(obj.meth(42), 42)
+		self.assertFalse(hasattr(obj, 'meth'))
+
+	def test_active_stubs_lists_stubs_from_enclosing_transactions(self):
+		obj = Object()
+		with MockTransaction:
+			when(obj).outer.then_return(None)
+			with MockTransaction:
+				when(obj).inner.then_return(None)
+				when(obj).outer(1).then_return(None)
+				self.assertEqual(MockTransaction.active_stubs(),
+					[(obj, 'outer', obj.outer), (obj, 'inner', obj.inner)])
+			self.assertEqual(MockTransaction.active_stubs(), [(obj, 'outer', obj.outer)])
+		self.assertEqual(MockTransaction.active_stubs(), [])
+
+	def test_settings_are_inherited_by_nested_transactions_and_reset_at_rollback(self):
+		with MockTransaction:
+			MockTransaction.fail_fast = True
+			with MockTransaction:
+				self.assertTrue(MockTransaction.fail_fast)
+				MockTransaction.fail_fast = False
+				MockTransaction.report_dir = 'reports'
+			self.assertTrue(MockTransaction.fail_fast)
+			self.assertEqual(MockTransaction.report_dir, None)
+		self.assertFalse(MockTransaction.fail_fast)
+
+	def test_method_replaced_after_stubbing_is_stubbed_again(self):
+		obj = Object()
+		with MockTransaction:
+			original_stub = when(obj).meth.then_return(1)._stub
+			modify(obj).meth = lambda: 2
+			when(obj).meth.then_return(3)
+			self.assertFalse(obj.meth is original_stub)
+			self.assertEqual(obj.meth(), 3)
+		self.assertFalse(hasattr(obj, 'meth'))